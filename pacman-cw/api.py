@@ -32,6 +32,8 @@
 
 from random import random
 from pacman import Directions
+from game import FoodView
+import distanceCalculator
 import util
 
 #
@@ -151,50 +153,85 @@ def food(state):
     #
     # In both cases, walls block the view.
     
-    foodList= []
-    foodGrid = state.getFood()
-    width = foodGrid.width
-    height = foodGrid.height
-    for i in range(width):
-        for j in range(height):
-            if foodGrid[i][j] == True:
-                foodList.append((i, j))
-            
+    #
+    # The list is a copy of the one kept by foodView(), so it can be changed.
+
+    foodList = list(foodView(state).getFoodList())
+
     # Return list of food that is visible
     return foodList
 
+def foodSet(state):
+    # Returns the food positions as a frozenset, for testing whether
+    # there is food at a location.
+
+    return foodView(state).getFood()
+
+def foodMask(state):
+    # Returns the food as a string of width * height bytes, with "\x01"
+    # where there is food and "\x00" elsewhere. The byte for (x, y) is
+    # at x * height + y. numpy.frombuffer() turns it into an array.
+
+    return foodView(state).getMask()
+
+def capsuleSet(state):
+    # Returns the capsule positions as a frozenset.
+
+    return foodView(state).getCapsules()
+
 def walls(state):
     # Returns a list of (x, y) pairs of wall positions
     #
     # This version just returns all the current wall locations
     # extracted from the state data.  In later versions, this will be
     # restricted by distance, and include some uncertainty.
-    
-    wallList= []
-    wallGrid = state.getWalls()
-    width = wallGrid.width
-    height = wallGrid.height
-    for i in range(width):
-        for j in range(height):
-            if wallGrid[i][j] == True:
-                wallList.append((i, j))            
-    return wallList
+    #
+    # The list is shared between calls, so it cannot be changed. Use
+    # list(walls(state)) for a copy that can.
+
+    return layoutInfo(state).walls
+
+def wallSet(state):
+    # Returns the same wall positions as walls(), as a frozenset, for
+    # testing whether a location is a wall.
+
+    return layoutInfo(state).wallSet
+
+def layoutKey(state):
+    # A key that is the same for every state on the same layout (see
+    # Layout.getKey), to keep what is worked out once for a layout by.
+
+    return state.getLayoutKey()
+
+def mazeDistancer(state):
+    # The maze distances of the state's layout, as a Distancer (see
+    # distanceCalculator.py), worked out once for each layout.
+
+    return distanceCalculator.getStateDistancer(state)
 
 def corners(state):
     # Returns the coordinates of the four corners of the state space.
     #
     # For harder exploration we could obfusticate this information.
+    #
+    # As with walls(), the list cannot be changed.
 
-    corners=[]
-    wallGrid = state.getWalls()
-    width = wallGrid.width
-    height = wallGrid.height
-    corners.append((0, 0))
-    corners.append((width-1, 0))
-    corners.append((0, height-1))
-    corners.append((width-1, height-1))
-    return corners
+    return layoutInfo(state).corners
                 
+def observe(state):
+    # Returns an Observation: everything that the functions above
+    # sense, in one object.
+    #
+    # Each field is only worked out the first time it is read, and the
+    # same Observation is returned for repeated calls on the same state,
+    # so an agent can call this wherever it needs to on a move and only
+    # pays once for what it reads.
+
+    if lastObservation[0] is not state:
+        lastObservation[0] = state
+        lastObservation[1] = Observation(state)
+    return lastObservation[1]
+
 #
 # Acting
 #
@@ -244,15 +281,202 @@ def makeMove(direction, legal):
 # Details that you don't need to look at if you don't want to.
 #
 
+class ReadOnlyList(list):
+    # A list that raises a TypeError if anything tries to change it.
+    # Concatenating it with another list still gives an ordinary list.
+
+    def readOnly(self, *args):
+        raise TypeError("this list is shared between calls and cannot be changed")
+
+    append = extend = insert = pop = remove = reverse = sort = readOnly
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = readOnly
+    __iadd__ = __imul__ = readOnly
+
+class LayoutInfo:
+    # The wall list, wall set and corners of a layout, and the table of
+    # lines of sight used by visible().
+
+    # The step taken by a line of sight in each direction
+    rayVectors = {Directions.NORTH: (0, 1), Directions.SOUTH: (0, -1),
+                  Directions.EAST: (1, 0), Directions.WEST: (-1, 0)}
+
+    def __init__(self, wallGrid):
+        wallList = []
+        width = wallGrid.width
+        height = wallGrid.height
+        for i in range(width):
+            for j in range(height):
+                if wallGrid[i][j] == True:
+                    wallList.append((i, j))
+        self.width = width
+        self.height = height
+        self.walls = ReadOnlyList(wallList)
+        self.wallSet = frozenset(wallList)
+        self.corners = ReadOnlyList([(0, 0), (width-1, 0), (0, height-1), (width-1, height-1)])
+        # Built the first time partial visibility needs it
+        self.rays = None
+
+    def buildRays(self):
+        # For each open cell and direction, the cells that can be seen
+        # along the corridor, nearest first, up to the first wall. Each
+        # ray is kept both as a tuple, for the order, and as a frozenset.
+        self.rays = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                if (x, y) in self.wallSet:
+                    continue
+                for direction, (dx, dy) in self.rayVectors.items():
+                    ray = []
+                    next = (x + dx, y + dy)
+                    while next not in self.wallSet and 0 <= next[0] < self.width and 0 <= next[1] < self.height:
+                        ray.append(next)
+                        next = (next[0] + dx, next[1] + dy)
+                    self.rays[((x, y), direction)] = (tuple(ray), frozenset(ray))
+
+    def getRay(self, cell, direction):
+        # The (tuple, frozenset) pair for the ray from cell in direction.
+        # There is nothing to see from a wall or in direction STOP.
+        if self.rays == None:
+            self.buildRays()
+        return self.rays.get((cell, direction), ((), frozenset()))
+
+    def getSight(self, cell, direction, limit):
+        # The cells in the ray from cell in direction that are at most
+        # limit steps away. Along a straight corridor that is also their
+        # distance through the maze, as distanceLimited() measures it.
+        ray = self.getRay(cell, direction)[0]
+        if limit >= len(ray):
+            return self.getRay(cell, direction)[1]
+        return frozenset(ray[:limit])
+
+# Walls never change during a game, so the LayoutInfo for a layout is
+# only worked out once, and kept by the layout's key. The last one used
+# is also kept with the state it was asked for, so that repeated calls
+# on the same state do not even look at the key.
+layoutInfoCache = {}
+lastLayoutInfo = [None, None]
+
+def layoutInfo(state):
+    if lastLayoutInfo[0] is state:
+        return lastLayoutInfo[1]
+    key = state.getLayoutKey()
+    if key not in layoutInfoCache:
+        layoutInfoCache[key] = LayoutInfo(state.getWalls())
+    lastLayoutInfo[0] = state
+    lastLayoutInfo[1] = layoutInfoCache[key]
+    return lastLayoutInfo[1]
+
+class lazyField(object):
+    # A field of Observation that is worked out from the state the first
+    # time it is read, and kept in the slot named after it with a
+    # leading underscore.
+
+    def __init__(self, compute):
+        self.compute = compute
+        self.slot = '_' + compute.__name__
+        self.__doc__ = compute.__doc__
+
+    def __get__(self, observation, owner=None):
+        if observation is None:
+            return self
+        try:
+            return getattr(observation, self.slot)
+        except AttributeError:
+            value = self.compute(observation)
+            setattr(observation, self.slot, value)
+            return value
+
+class Observation(object):
+    # What Pacman senses on one move, as returned by observe(). The
+    # fields hold the same values as the function of the same name:
+    #
+    # position, legal, food, foodSet, foodMask, capsules, ghosts,
+    # ghostStates, ghostStatesWithTimes, walls, wallSet, corners
+    #
+    # Lists are ReadOnlyLists, since they are shared by everything that
+    # reads the observation. The walls and corners are those kept for
+    # the layout, so they cost nothing to read.
+
+    __slots__ = ['state', 'info', '_position', '_legal', '_food', '_capsules',
+                 '_ghosts', '_ghostStates', '_ghostStatesWithTimes']
+
+    def __init__(self, state):
+        self.state = state
+        self.info = layoutInfo(state)
+
+    @lazyField
+    def position(self):
+        return whereAmI(self.state)
+
+    @lazyField
+    def legal(self):
+        return ReadOnlyList(legalActions(self.state))
+
+    @lazyField
+    def food(self):
+        return ReadOnlyList(foodView(self.state).getFoodList())
+
+    @property
+    def foodSet(self):
+        return foodSet(self.state)
+
+    @property
+    def foodMask(self):
+        return foodMask(self.state)
+
+    @lazyField
+    def capsules(self):
+        return ReadOnlyList(capsules(self.state))
+
+    @lazyField
+    def ghosts(self):
+        return ReadOnlyList(ghosts(self.state))
+
+    @lazyField
+    def ghostStates(self):
+        return ReadOnlyList(ghostStates(self.state))
+
+    @lazyField
+    def ghostStatesWithTimes(self):
+        return ReadOnlyList(ghostStatesWithTimes(self.state))
+
+    @property
+    def walls(self):
+        return self.info.walls
+
+    @property
+    def wallSet(self):
+        return self.info.wallSet
+
+    @property
+    def corners(self):
+        return self.info.corners
+
+# The last state observed, and its Observation
+lastObservation = [None, None]
+
+def foodView(state):
+    # The FoodView of the state (see game.py). The game keeps it up to
+    # date as food and capsules are eaten, so the food grid does not
+    # have to be scanned on every call. A state that was not set up by
+    # the game may not have one, and then it is made from the grid.
+
+    view = state.data.foodView
+    if view == None:
+        view = FoodView(state.getFood(), state.getCapsules())
+    return view
+
 def distanceLimited(objects, state, limit):
     # When passed a list of object locations, tests how far they are
     # from Pacman, and only returns the ones that are within "limit".
+    # Distance is measured through the maze, so walls count.
 
     pacman = state.getPacmanPosition()
+    distancer = mazeDistancer(state)
     nearObjects = []
     
     for i in range(len(objects)):
-        if util.manhattanDistance(pacman,objects[i]) <= limit:
+        if distancer.getDistance(pacman,objects[i]) <= limit:
             nearObjects.append(objects[i])
 
     return nearObjects
@@ -261,59 +485,11 @@ def inFront(object, facing, state):
     # Returns true if the object is along the corridor in the
     # direction of the parameter "facing" before a wall gets in the
     # way.
-    
-    pacman = state.getPacmanPosition()
-    pacman_x = pacman[0]
-    pacman_y = pacman[1]
-    wallList = walls(state)
-
-    # If Pacman is facing North
-    if facing == Directions.NORTH:
-        # Check if the object is anywhere due North of Pacman before a
-        # wall intervenes.
-        next = (pacman_x, pacman_y + 1)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (pacman_x, next[1] + 1)
-        return False
-
-    # If Pacman is facing South
-    if facing == Directions.SOUTH:
-        # Check if the object is anywhere due North of Pacman before a
-        # wall intervenes.
-        next = (pacman_x, pacman_y - 1)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (pacman_x, next[1] - 1)
-        return False
+    #
+    # The corridors are looked up in a table made once for each layout.
 
-    # If Pacman is facing East
-    if facing == Directions.EAST:
-        # Check if the object is anywhere due East of Pacman before a
-        # wall intervenes.
-        next = (pacman_x + 1, pacman_y)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (next[0] + 1, pacman_y)
-        return False
-    
-    # If Pacman is facing West
-    if facing == Directions.WEST:
-        # Check if the object is anywhere due West of Pacman before a
-        # wall intervenes.
-        next = (pacman_x - 1, pacman_y)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (next[0] - 1, pacman_y)
-        return False
+    pacman = state.getPacmanPosition()
+    return object in layoutInfo(state).getRay(pacman, facing)[1]
 
 def atSide(object, facing, state):
     # Returns true if the object is in a side corridor perpendicular
@@ -357,10 +533,13 @@ def visible(objects, state):
 
     # This code creates partial observability by only returning some
     # of the members of objects.
+    #
+    # What Pacman can see along each corridor comes from the table of
+    # lines of sight for the layout, so each test is a set lookup.
     else:
         facing = state.getPacmanState().configuration.direction
-        visibleObjects = []
-        sideObjects = []
+        pacman = state.getPacmanPosition()
+        info = layoutInfo(state)
         
         if facing != Directions.STOP:
             
@@ -368,16 +547,16 @@ def visible(objects, state):
             # and to the side (if there are any side corridors).
             
             # Objects in front. Visible up to "visibilityLimit"
-            for i in range(len(objects)):
-                if inFront(objects[i], facing, state):
-                    visibleObjects.append(objects[i])
-            visibleObjects = distanceLimited(visibleObjects, state, visibilityLimit)
+            inSight = info.getSight(pacman, facing, visibilityLimit)
+            visibleObjects = [o for o in objects if o in inSight]
             
             # Objects to the side. Visible up to "sideLimit"
-            for i in range(len(objects)):
-                if atSide(objects[i], facing, state):
-                    sideObjects.append(objects[i])
-            sideObjects = distanceLimited(sideObjects, state, sideLimit)
+            if facing == Directions.NORTH or facing == Directions.SOUTH:
+                sides = [Directions.WEST, Directions.EAST]
+            else:
+                sides = [Directions.NORTH, Directions.SOUTH]
+            atSides = info.getSight(pacman, sides[0], sideLimit) | info.getSight(pacman, sides[1], sideLimit)
+            sideObjects = [o for o in objects if o in atSides]
 
             # Combine lists.
             visibleObjects = visibleObjects + sideObjects
@@ -390,16 +569,10 @@ def visible(objects, state):
             # after the first move is made, so this code will not run
             # after the first move :-(
 
-            for i in range(len(objects)):
-                if inFront(objects[i], Directions.NORTH, state):
-                    visibleObjects.append(objects[i])
-                if inFront(objects[i], Directions.SOUTH, state):
-                    visibleObjects.append(objects[i])
-                if inFront(objects[i], Directions.EAST, state):
-                    visibleObjects.append(objects[i])
-                if inFront(objects[i], Directions.WEST, state):
-                    visibleObjects.append(objects[i])
-            visibleObjects = distanceLimited(visibleObjects, state, visibilityLimit)
+            inSight = frozenset()
+            for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                inSight = inSight | info.getSight(pacman, direction, visibilityLimit)
+            visibleObjects = [o for o in objects if o in inSight]
         return visibleObjects
 
 def audible(ghosts, state):
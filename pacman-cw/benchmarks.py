@@ -0,0 +1,282 @@
+# benchmarks.py
+#
+# Timing harnesses for the MDP agents and the game engine.
+#
+# Run from this directory, for example:
+#
+#   python benchmarks.py solvers -l originalClassic -m 5
+#   python benchmarks.py solvers -l '*Classic' -s array,policy
+#   python benchmarks.py food -l bigSearch -m 300
+#   python benchmarks.py memory -l mediumClassic -n 100 -e full
+#   python benchmarks.py plies -l mediumClassic -k 4 -n 20
+#
+# Each benchmark plays out a fixed-seed game with the code under test
+# and prints a small table. None of them draw anything.
+#
+# Intended to work with the PacMan AI projects from:
+#
+# http://ai.berkeley.edu/
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+from game import Agent
+from game import Directions
+import api
+import gc
+import ghostAgents
+import layout
+import pacman
+import pacmanAgents
+import random
+import resource
+import sys
+import textDisplay
+import time
+import util
+
+# The moves that MDPAgent.getPolicy() names
+POLICY_MOVES = {"north_util": Directions.NORTH, "south_util": Directions.SOUTH,
+                "east_util": Directions.EAST, "west_util": Directions.WEST}
+
+
+def loadGame(layoutName, pacmanAgent, seed, numGhosts=None):
+    # Set up a game on the named layout against random ghosts, with the
+    # random number generator seeded so that the game can be repeated.
+    # With numGhosts, the layout gets that many ghosts (see withGhosts).
+    random.seed(seed)
+    lay = layout.getLayout(layoutName)
+    if lay == None:
+        raise Exception("The layout " + layoutName + " cannot be found")
+    if numGhosts != None:
+        lay = withGhosts(lay, numGhosts)
+    ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+    rules = pacman.ClassicGameRules()
+    return rules.newGame(lay, pacmanAgent, ghosts, textDisplay.NullGraphics(), quiet=True)
+
+
+def withGhosts(lay, numGhosts):
+    # A copy of lay with numGhosts ghosts. Ghosts beyond the layout's own
+    # are started in its empty cells (such as the rest of the ghost
+    # house), taken in the order they appear in the layout file.
+    lines = [list(line) for line in lay.layoutText]
+    extra = numGhosts - lay.getNumGhosts()
+    for line in lines:
+        for i, char in enumerate(line):
+            if extra > 0 and char == ' ':
+                line[i] = 'G'
+                extra -= 1
+    if extra > 0:
+        raise Exception("There is no room for %d ghosts in the layout" % numGhosts)
+    return layout.Layout([''.join(line) for line in lines])
+
+
+def advance(game, state, action):
+    # Play Pacman's action and then one move for each ghost.
+    state = state.generateSuccessor(0, action)
+    for agent in game.agents[1:]:
+        if state.isWin() or state.isLose():
+            break
+        state = state.generateSuccessor(agent.index, agent.getAction(state))
+    return state
+
+
+def compareSolvers(layoutName, solvers, moves, agentOpts={}, seed="cs188"):
+    # Time MDPAgent's decision with each of the named solvers on the
+    # same sequence of states, and check that they all pick the same
+    # move. Pacman follows the policy of the first solver exactly (no
+    # motion noise) so that every solver sees the same game.
+    #
+    # agentOpts are passed to every agent, as with pacman.py -a.
+    import mdpAgents
+
+    util.mutePrint()
+    agents = [mdpAgents.MDPAgent(solver=name, **agentOpts) for name in solvers]
+    util.unmutePrint()
+    game = loadGame(layoutName, agents[0], seed)
+    state = game.state
+    util.mutePrint()
+    for agent in agents:
+        agent.registerInitialState(state.deepCopy())
+    util.unmutePrint()
+
+    times = [0.0 for name in solvers]
+    sweeps = [0 for name in solvers]
+    disagreements = 0
+    played = 0
+    while played < moves and not (state.isWin() or state.isLose()):
+        choices = []
+        for i, agent in enumerate(agents):
+            observation = state.deepCopy()
+            start = time.time()
+            valueMap = agent.makeValueMap(observation)
+            made, residual = agent.valueIteration(observation, agent.reward, agent.gamma, valueMap)
+            choices.append(agent.getPolicy(observation, valueMap))
+            times[i] += time.time() - start
+            sweeps[i] += made
+        if len(set(choices)) > 1:
+            disagreements += 1
+        played += 1
+
+        action = POLICY_MOVES[choices[0]]
+        if action not in state.getLegalPacmanActions():
+            action = Directions.STOP
+        state = advance(game, state, action)
+
+    print "Layout: %s, moves: %d" % (layoutName, played)
+    for name, total, made in zip(solvers, times, sweeps):
+        print "%-10s %10.2f ms/move %8.1fx %8.1f sweeps/move" % (
+            name, 1000 * total / played, times[0] / total, float(made) / played)
+    print "Moves where the solvers disagreed: %d" % disagreements
+    return times, disagreements
+
+
+def compareSolversOnLayouts(pattern, solvers, moves, agentOpts={}):
+    # Run compareSolvers() on every layout that matches pattern, and sum
+    # up the speedups and disagreements at the end.
+    results = []
+    for layoutName in layout.findLayouts(pattern):
+        results.append((layoutName,) + compareSolvers(layoutName, solvers, moves, agentOpts))
+        print
+
+    if len(results) > 1:
+        print "%-18s" % "Layout", " ".join(["%10s" % name for name in solvers[1:]]), "disagreements  (speedup over %s)" % solvers[0]
+        for layoutName, times, disagreements in results:
+            print "%-18s" % layoutName, " ".join(["%9.1fx" % (times[0] / total) for total in times[1:]]), "%13d" % disagreements
+    return results
+
+
+def scanFood(state):
+    # api.food() as it was before the game kept a FoodView: a scan of
+    # the whole food grid on every call.
+    foodList = []
+    foodGrid = state.getFood()
+    for i in range(foodGrid.width):
+        for j in range(foodGrid.height):
+            if foodGrid[i][j] == True:
+                foodList.append((i, j))
+    return foodList
+
+
+def timeFoodQueries(layoutName, moves, seed="cs188"):
+    # Time each way of asking the api where the food is, once on each
+    # state of a game in which Pacman moves at random, as an agent would
+    # on each move, and then again on the same state.
+    queries = [("scan", scanFood), ("api.food", api.food), ("api.foodSet", api.foodSet),
+               ("api.foodMask", api.foodMask)]
+    print "Layout: %s" % layoutName
+    print "%-14s %14s %14s" % ("", "us/first call", "us/repeat call")
+    for name, query in queries:
+        # Every query sees the same game, since the moves are drawn from
+        # the same seed
+        game = loadGame(layoutName, Agent(), seed)
+        state = game.state
+        first = 0.0
+        repeat = 0.0
+        played = 0
+        while played < moves and not (state.isWin() or state.isLose()):
+            start = time.time()
+            query(state)
+            first += time.time() - start
+            start = time.time()
+            query(state)
+            repeat += time.time() - start
+            played += 1
+            state = advance(game, state, random.choice(state.getLegalPacmanActions()))
+        print "%-14s %14.1f %14.1f" % (name, 1e6 * first / played, 1e6 * repeat / played)
+    print "Moves: %d, food left: %d" % (played, state.getNumFood())
+
+
+def measureMemory(layoutName, numGames, exploreMode, seed="cs188"):
+    # Play numGames games in a row with GreedyAgent, as pacman.py -n
+    # would, with GameState.setExploreMode(exploreMode), and print how
+    # much memory the process holds every tenth of the way through.
+    # With exploration tracking off the numbers should stay flat.
+    pacman.GameState.setExploreMode(exploreMode)
+    print "Layout: %s, explore mode: %s" % (layoutName, exploreMode)
+    print "%6s %12s %12s %12s %14s" % ("games", "successors", "explored", "objects", "peak RSS (kB)")
+    step = max(1, numGames / 10)
+    start = time.time()
+    for i in range(numGames):
+        game = loadGame(layoutName, pacmanAgents.GreedyAgent(), "%s-%d" % (seed, i))
+        game.run()
+        if (i + 1) % step == 0 or i + 1 == numGames:
+            gc.collect()
+            print "%6d %12d %12d %12d %14d" % (i + 1, pacman.GameState.numExplored,
+                                               len(pacman.GameState.explored), len(gc.get_objects()),
+                                               resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    print "%.2f s/game" % ((time.time() - start) / numGames)
+    pacman.GameState.setExploreMode('off')
+
+
+def timePlies(layoutName, numGhosts, numGames, seed="cs188"):
+    # Play numGames games with GreedyAgent against numGhosts random
+    # ghosts and report how many plies (moves by any agent) the engine
+    # plays per second, including the successors GreedyAgent looks at.
+    plies = 0
+    scores = []
+    start = time.time()
+    for i in range(numGames):
+        game = loadGame(layoutName, pacmanAgents.GreedyAgent(), "%s-%d" % (seed, i), numGhosts)
+        game.run()
+        plies += len(game.moveHistory)
+        scores.append(game.state.getScore())
+    elapsed = time.time() - start
+    print "Layout: %s, ghosts: %d, games: %d" % (layoutName, numGhosts, numGames)
+    print "%d plies in %.2f s: %.0f plies/s" % (plies, elapsed, plies / elapsed)
+    print "Scores:", ", ".join(["%d" % score for score in scores])
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python benchmarks.py <benchmark> <options>
+    BENCHMARKS: solvers  - time MDPAgent with each value iteration solver
+                food     - time the api's food queries
+                memory   - watch memory use over a batch of games
+                plies    - time the game engine over a batch of games
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-l', '--layout', dest='layout', default='originalClassic',
+                      help=pacman.default('the LAYOUT_FILE to play on, or a pattern such as "*Classic"'), metavar='LAYOUT_FILE')
+    parser.add_option('-m', '--moves', dest='moves', type='int', default=5,
+                      help=pacman.default('the number of Pacman moves to time'))
+    parser.add_option('-n', '--numGames', dest='numGames', type='int', default=100,
+                      help=pacman.default('the number of games to play for the memory and plies benchmarks'))
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=4,
+                      help=pacman.default('the number of ghosts for the plies benchmark'))
+    parser.add_option('-e', '--explore', dest='explore', type='choice', choices=pacman.EXPLORE_MODES, default='off',
+                      help=pacman.default('what GameState records about generated successors: off, count or full'))
+    parser.add_option('-s', '--solvers', dest='solvers', default='dict,array',
+                      help=pacman.default('comma separated solvers to compare, the first is the baseline'))
+    parser.add_option('-a', '--agentArgs', dest='agentArgs',
+                      help='Comma separated values sent to every agent. e.g. "stop=residual,epsilon=0.01"')
+    options, args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error('Expected the name of one benchmark')
+    return args[0], options
+
+
+if __name__ == '__main__':
+    benchmark, options = readCommand(sys.argv[1:])
+    if benchmark == 'solvers':
+        compareSolversOnLayouts(options.layout, options.solvers.split(','), options.moves,
+                                pacman.parseAgentArgs(options.agentArgs))
+    elif benchmark == 'food':
+        timeFoodQueries(options.layout, options.moves)
+    elif benchmark == 'memory':
+        measureMemory(options.layout, options.numGames, options.explore)
+    elif benchmark == 'plies':
+        timePlies(options.layout, options.numGhosts, options.numGames)
+    else:
+        raise Exception('Unknown benchmark ' + benchmark)
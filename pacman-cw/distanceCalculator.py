@@ -0,0 +1,246 @@
+# distanceCalculator.py
+# ---------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Exact maze distances between the open cells of a layout.
+
+The distances for a layout are computed the first time they are asked
+for, and shared by every game on a layout with the same text:
+
+  distancer = distanceCalculator.getDistancer(layout)
+  distancer.getDistance((1, 1), (5, 3))
+
+For layouts of up to MAX_MATRIX_CELLS open cells the distances between
+all pairs of cells are kept in one array of unsigned shorts, which is
+also saved to CACHE_DIRECTORY so that later runs can load it instead of
+searching the maze again. The directory can be shared, so a saved matrix
+starts with a header that names the format, the layout and a checksum of
+the distances, and one that does not match is searched again. Larger mazes would need too much memory for
+that, so their distances are found one breadth first search at a time,
+from each cell that a distance is asked from, and the most recently used
+MAX_ROWS searches are kept.
+"""
+
+from array import array
+import collections
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import zlib
+
+# Layouts with more open cells than this do not get a full matrix
+MAX_MATRIX_CELLS = 2000
+# Number of rows kept for layouts without a full matrix
+MAX_ROWS = 256
+# The distance given between cells that cannot reach each other
+UNREACHABLE = 65535
+# Where the matrices are saved, or None to keep them in memory only
+CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), 'pacmanDistances')
+# The header of a saved matrix: MATRIX_MAGIC, MATRIX_VERSION, the byte
+# order it was saved in, the number of cells, the sha1 of the layout's
+# key and the crc32 of the distances
+MATRIX_MAGIC = 'PDST'
+MATRIX_VERSION = 1
+MATRIX_HEADER = struct.Struct('<4sIcI20sI')
+
+DISTANCE_CACHE = {}
+
+def getDistancer(layout, cacheDirectory=None):
+    """
+    Returns the Distancer for layout, building it (or loading it from
+    cacheDirectory, which defaults to CACHE_DIRECTORY) the first time a
+    layout with this text is seen.
+    """
+    key = layout.getKey()
+    if key not in DISTANCE_CACHE:
+        if cacheDirectory == None: cacheDirectory = CACHE_DIRECTORY
+        DISTANCE_CACHE[key] = Distancer(layout, cacheDirectory)
+    return DISTANCE_CACHE[key]
+
+def getStateDistancer(state):
+    "Returns the Distancer for the layout of a game state."
+    return getDistancer(state.data.layout)
+
+class Distancer:
+    """
+    Maze distances for one layout. Positions can be anywhere an agent
+    can be, including halfway between two cells as scared ghosts are.
+    """
+
+    def __init__(self, layout, cacheDirectory=None):
+        walls = layout.walls
+        self.cells = [(x, y) for x in range(layout.width) for y in range(layout.height) if not walls[x][y]]
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.neighbours = []
+        for x, y in self.cells:
+            adjacent = [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]
+            self.neighbours.append([self.index[cell] for cell in adjacent if cell in self.index])
+
+        self.matrix = None
+        self.rows = collections.OrderedDict()
+        # nearby(cell, radius) results, worked out when first asked for
+        self.neighbourhoods = {}
+        if len(self.cells) <= MAX_MATRIX_CELLS:
+            path = None
+            self.layoutDigest = hashlib.sha1(layout.getKey()).digest()
+            if cacheDirectory != None:
+                name = '%s.v%d.dist' % (self.layoutDigest.encode('hex'), MATRIX_VERSION)
+                path = os.path.join(cacheDirectory, name)
+            self.matrix = self.loadMatrix(path)
+            if self.matrix == None:
+                self.matrix = self.buildMatrix()
+                self.saveMatrix(path)
+
+    def search(self, source):
+        "The distances from the cell with index source to every cell, as an array."
+        distances = array('H', [UNREACHABLE]) * len(self.cells)
+        distances[source] = 0
+        frontier = [source]
+        distance = 0
+        while frontier:
+            distance += 1
+            reached = []
+            for cell in frontier:
+                for neighbour in self.neighbours[cell]:
+                    if distances[neighbour] == UNREACHABLE:
+                        distances[neighbour] = distance
+                        reached.append(neighbour)
+            frontier = reached
+        return distances
+
+    def buildMatrix(self):
+        matrix = array('H')
+        for source in range(len(self.cells)):
+            matrix.extend(self.search(source))
+        return matrix
+
+    def getHeader(self, matrix):
+        "The header saved before matrix (see MATRIX_HEADER)."
+        checksum = zlib.crc32(matrix.tostring()) & 0xffffffff
+        return MATRIX_HEADER.pack(MATRIX_MAGIC, MATRIX_VERSION, sys.byteorder[0],
+                                  len(self.cells), self.layoutDigest, checksum)
+
+    def loadMatrix(self, path):
+        """
+        The matrix saved at path, or None if there is not a complete one
+        for this layout, in this format, whose distances match the
+        checksum saved with them.
+        """
+        if path == None or not os.path.exists(path): return None
+        matrix = array('H')
+        try:
+            f = open(path, 'rb')
+            try:
+                header = f.read(MATRIX_HEADER.size)
+                matrix.fromfile(f, len(self.cells) ** 2)
+                extra = f.read(1)
+            finally: f.close()
+        except (IOError, EOFError):
+            return None
+        if header != self.getHeader(matrix) or extra != '':
+            return None
+        return matrix
+
+    def saveMatrix(self, path):
+        "Saves the matrix at path. The cache is only an optimisation, so failures are ignored."
+        if path == None: return
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # Write to a temporary file first so that a run that reads the
+            # cache at the same time never sees half a matrix
+            temporary = '%s.%d' % (path, os.getpid())
+            f = open(temporary, 'wb')
+            try:
+                f.write(self.getHeader(self.matrix))
+                self.matrix.tofile(f)
+            finally: f.close()
+            os.rename(temporary, path)
+        except (IOError, OSError):
+            pass
+
+    def getRow(self, source):
+        "The distances from the cell with index source, for layouts without a matrix."
+        if source in self.rows:
+            row = self.rows.pop(source)
+        else:
+            row = self.search(source)
+            if len(self.rows) >= MAX_ROWS:
+                self.rows.popitem(last=False)
+        self.rows[source] = row
+        return row
+
+    def nearby(self, cell, radius):
+        """
+        The open cells within radius steps of the open cell, as a list of
+        (cell, distance) pairs.
+        """
+        key = (cell, radius)
+        if key not in self.neighbourhoods:
+            source = self.index[cell]
+            count = len(self.cells)
+            if self.matrix != None:
+                row = self.matrix[source * count:(source + 1) * count]
+            else:
+                row = self.getRow(source)
+            self.neighbourhoods[key] = [(self.cells[i], distance) for i, distance in enumerate(row) if distance <= radius]
+        return self.neighbourhoods[key]
+
+    def getCellDistance(self, cell1, cell2):
+        """
+        The maze distance between two open cells with integer
+        coordinates, or UNREACHABLE if either is a wall or there is no
+        path between them.
+        """
+        if cell1 not in self.index or cell2 not in self.index:
+            return UNREACHABLE
+        source, target = self.index[cell1], self.index[cell2]
+        if self.matrix != None:
+            return self.matrix[source * len(self.cells) + target]
+        return self.getRow(source)[target]
+
+    def getDistance(self, pos1, pos2):
+        """
+        The maze distance between two positions. A position between two
+        cells is that far from each of them.
+        """
+        if isInt(pos1) and isInt(pos2):
+            return self.getCellDistance((int(pos1[0]), int(pos1[1])), (int(pos2[0]), int(pos2[1])))
+        best = UNREACHABLE
+        for cell1, offset1 in getGrids2D(pos1):
+            for cell2, offset2 in getGrids2D(pos2):
+                distance = self.getCellDistance(cell1, cell2)
+                if distance != UNREACHABLE:
+                    best = min(best, distance + offset1 + offset2)
+        return best
+
+def isInt(pos):
+    x, y = pos
+    return x == int(x) and y == int(y)
+
+def getGrids2D(pos):
+    "The cells next to pos, with how far pos is from each."
+    grids = []
+    for x, xDistance in getGrids1D(pos[0]):
+        for y, yDistance in getGrids1D(pos[1]):
+            grids.append(((x, y), xDistance + yDistance))
+    return grids
+
+def getGrids1D(x):
+    intX = int(x)
+    if x == intX:
+        return [(intX, 0)]
+    return [(intX, x - intX), (intX + 1, intX + 1 - x)]
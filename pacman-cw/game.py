@@ -24,6 +24,13 @@ from util import *
 import time, os
 import traceback
 import sys
+import binascii
+
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
 
 #######################
 # Parts worth reading #
@@ -67,19 +74,29 @@ class Directions:
                WEST: EAST,
                STOP: STOP}
 
-class Configuration:
+class Configuration(object):
     """
     A Configuration holds the (x,y) coordinate of a character, along with its
     traveling direction.
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    A new Configuration is made for every move, so it has slots rather
+    than an instance dictionary.
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
         self.direction = direction
 
+    def __getstate__(self):
+        return (self.pos, self.direction)
+
+    def __setstate__(self, state):
+        self.pos, self.direction = state
+
     def getPosition(self):
         return (self.pos)
 
@@ -117,10 +134,11 @@ class Configuration:
             direction = self.direction # There is no stop direction
         return Configuration((x + dx, y+dy), direction)
 
-class AgentState:
+class AgentState(object):
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer', 'numCarrying', 'numReturned')
 
     def __init__( self, startConfiguration, isPacman ):
         self.start = startConfiguration
@@ -152,6 +170,13 @@ class AgentState:
         state.numReturned = self.numReturned
         return state
 
+    def __getstate__( self ):
+        return tuple( [getattr( self, name ) for name in AgentState.__slots__] )
+
+    def __setstate__( self, state ):
+        for name, value in zip( AgentState.__slots__, state ):
+            setattr( self, name, value )
+
     def getPosition(self):
         if self.configuration == None: return None
         return self.configuration.getPosition()
@@ -190,6 +215,8 @@ class Grid:
 
     def __eq__(self, other):
         if other == None: return False
+        # Comparing lists with an array would compare cell by cell
+        if isinstance(other, (ArrayGrid, BitGrid)): return other == self
         return self.data == other.data
 
     def __hash__(self):
@@ -204,7 +231,9 @@ class Grid:
         return hash(h)
 
     def copy(self):
-        g = Grid(self.width, self.height)
+        # Start from an empty grid rather than filling one only to replace it
+        g = Grid(0, 0)
+        g.width, g.height = self.width, self.height
         g.data = [x[:] for x in self.data]
         return g
 
@@ -280,6 +309,262 @@ def reconstituteGrid(bitRep):
     width, height = bitRep[:2]
     return Grid(width, height, bitRepresentation= bitRep[2:])
 
+class ArrayGrid(Grid):
+    """
+    A Grid backed by a width x height numpy array of booleans rather than
+    a list of lists. grid[x][y] reads and writes work as for Grid, since
+    grid[x] is a view of a row of the array, and as_array() gives the
+    whole array without copying it.
+
+    count(), asList(), packBits() and hashing are done by numpy rather
+    than by a loop over every cell in Python.
+    """
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        if not _NUMPY_ENABLED: raise Exception('ArrayGrid needs numpy, which is not installed')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.data = numpy.empty((width, height), dtype=bool)
+        self.data.fill(initialValue)
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def fromArray(array):
+        "Makes an ArrayGrid that uses array (without copying it) for its data."
+        g = ArrayGrid(0, 0)
+        g.width, g.height = array.shape
+        g.data = array
+        return g
+    fromArray = staticmethod(fromArray)
+
+    def as_array(self):
+        """
+        The grid as a read-only numpy array, indexed [x, y], that shares
+        its memory with the grid.
+        """
+        view = self.data.view()
+        view.flags.writeable = False
+        return view
+
+    def __eq__(self, other):
+        if other == None: return False
+        if isinstance(other, BitGrid): return other == self
+        return numpy.array_equal(self.data, other.data)
+
+    def __hash__(self):
+        # The same hash as Grid.__hash__: the number whose bit
+        # x * height + y is set where the grid is True
+        cells = self.width * self.height
+        if cells == 0: return hash(0)
+        packed = numpy.packbits(self.data.ravel()[::-1])
+        h = int(binascii.hexlify(packed.tostring()), 16) >> (-cells % 8)
+        return hash(h)
+
+    def copy(self):
+        return ArrayGrid.fromArray(self.data.copy())
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return ArrayGrid.fromArray(self.data)
+
+    def count(self, item =True ):
+        trues = int(numpy.count_nonzero(self.data))
+        if item == True: return trues
+        if item == False: return self.width * self.height - trues
+        return 0
+
+    def asList(self, key = True):
+        return [tuple(position) for position in numpy.argwhere(self.data == key).tolist()]
+
+    def packBits(self):
+        """
+        Returns an efficient int list representation
+
+        (width, height, bitPackedInts...)
+
+        The same as Grid.packBits, which always ends with a partly
+        filled (possibly empty) int.
+        """
+        cells = self.width * self.height
+        chunks = cells / self.CELLS_PER_INT + 1
+        flat = numpy.zeros(chunks * self.CELLS_PER_INT, dtype=numpy.int64)
+        flat[:cells] = self.data.ravel()
+        weights = 2 ** numpy.arange(self.CELLS_PER_INT - 1, -1, -1, dtype=numpy.int64)
+        ints = flat.reshape(chunks, self.CELLS_PER_INT).dot(weights)
+        return tuple([self.width, self.height] + ints.tolist())
+
+class BitGrid(Grid):
+    """
+    A Grid stored as the bits of one Python int, in which bit
+    x * height + y is set where the grid is True. That is the number that
+    Grid.__hash__ works out, so a BitGrid hashes the same as a Grid with
+    the same contents.
+
+    Python ints never change, so copy() just shares the int, and a write
+    makes a new one for the grid written to (copy on write). The hash is
+    worked out once for each int, count() counts the bits set, and
+    packBits() reads 30 bits at a time straight out of the int.
+
+    grid[x] is a BitGridColumn, so grid[x][y] reads and writes work as
+    for Grid, if more slowly.
+    """
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.bits = 0
+        if initialValue:
+            self.bits = (1 << (width * height)) - 1
+        self._hash = None
+        self._columns = None
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def fromBits(width, height, bits):
+        g = BitGrid(0, 0)
+        g.width, g.height = width, height
+        g.bits = bits
+        return g
+    fromBits = staticmethod(fromBits)
+
+    def __getitem__(self, i):
+        # The columns are made the first time the grid is indexed
+        if self._columns == None:
+            self._columns = [BitGridColumn(self, x) for x in range(self.width)]
+        return self._columns[i]
+
+    def __setitem__(self, key, item):
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
+
+    def setCell(self, index, value):
+        "Sets the bit for cell x * height + y."
+        if value:
+            self.bits = self.bits | (1 << index)
+        else:
+            self.bits = self.bits & ~(1 << index)
+        self._hash = None
+
+    def __str__(self):
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None: return False
+        if (self.width, self.height) != (other.width, other.height): return False
+        if isinstance(other, BitGrid): return self.bits == other.bits
+        return self.asList() == other.asList()
+
+    def __hash__(self):
+        if self._hash == None:
+            self._hash = hash(self.bits)
+        return self._hash
+
+    def copy(self):
+        g = BitGrid.fromBits(self.width, self.height, self.bits)
+        g._hash = self._hash
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return self.copy()
+
+    def count(self, item =True ):
+        trues = bin(self.bits).count('1')
+        if item == True: return trues
+        if item == False: return self.width * self.height - trues
+        return 0
+
+    def asList(self, key = True):
+        # The cells, lowest bit first, as a string of 1s and 0s
+        cells = bin(self.bits)[2:][::-1].ljust(self.width * self.height, '0')
+        if key == True: char = '1'
+        elif key == False: char = '0'
+        else: return []
+        list = []
+        height = self.height
+        index = cells.find(char)
+        while index != -1:
+            list.append( divmod(index, height) )
+            index = cells.find(char, index + 1)
+        return list
+
+    def packBits(self):
+        """
+        Returns an efficient int list representation
+
+        (width, height, bitPackedInts...)
+
+        The same as Grid.packBits, which puts the first cell of each 30
+        in the highest bit and always ends with a partly filled (possibly
+        empty) int.
+        """
+        mask = (1 << self.CELLS_PER_INT) - 1
+        bits = [self.width, self.height]
+        for start in range(0, self.width * self.height + 1, self.CELLS_PER_INT):
+            chunk = (self.bits >> start) & mask
+            bits.append(int(format(chunk, '0%db' % self.CELLS_PER_INT)[::-1], 2))
+        return tuple(bits)
+
+    def _unpackBits(self, bits):
+        """
+        Fills in data from a bit-level representation
+        """
+        value = 0
+        for i, packed in enumerate(bits):
+            chunk = int(format(packed, '0%db' % self.CELLS_PER_INT)[::-1], 2)
+            value |= chunk << (i * self.CELLS_PER_INT)
+        self.bits = value & ((1 << (self.width * self.height)) - 1)
+        self._hash = None
+
+class BitGridColumn:
+    """
+    Column x of a BitGrid, so that grid[x][y] works.
+    """
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.offset = x * grid.height
+
+    def __getitem__(self, y):
+        if y < 0: y += self.grid.height
+        if not 0 <= y < self.grid.height: raise IndexError('grid index out of range')
+        return (self.grid.bits >> (self.offset + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        if y < 0: y += self.grid.height
+        if not 0 <= y < self.grid.height: raise IndexError('grid index out of range')
+        self.grid.setCell(self.offset + y, value)
+
+    def __len__(self):
+        return self.grid.height
+
+# The kinds of Grid that layouts can be made with (see makeGrid)
+GRID_BACKENDS = {'list': Grid, 'bits': BitGrid}
+if _NUMPY_ENABLED:
+    GRID_BACKENDS['array'] = ArrayGrid
+gridBackend = 'list'
+
+def setGridBackend(name):
+    "Chooses the kind of Grid that makeGrid() returns from now on."
+    global gridBackend
+    if name not in GRID_BACKENDS:
+        raise Exception('Unknown grid backend %s, expected one of %s' % (name, ', '.join(sorted(GRID_BACKENDS))))
+    gridBackend = name
+
+def makeGrid(width, height, initialValue=False):
+    "A new Grid of the kind chosen with setGridBackend(), which is a list Grid by default."
+    return GRID_BACKENDS[gridBackend](width, height, initialValue)
+
 ####################################
 # Parts you shouldn't have to read #
 ####################################
@@ -368,22 +653,186 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
-class GameStateData:
+class ActionTable:
     """
+    The moves that are legal from each open cell of a maze, worked out
+    once per layout (see Layout.actionTable) so that the rules do not
+    search the walls on every move.
+
+    The moves from a cell are listed in the same order as
+    Actions.getPossibleActions lists them, which matters to agents that
+    choose between them at random. The tables are keyed by position, and
+    positions that are not in them (those between cells, and cells on
+    the edge of the maze) are looked up in the walls as before.
+    """
+    def __init__( self, walls ):
+        self.walls = walls
+        self.moves = {}
+        self.ghostMoves = {}
+        directions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+        for x in range( 1, walls.width - 1 ):
+            for y in range( 1, walls.height - 1 ):
+                if walls[x][y]: continue
+                possible = Actions.getPossibleActions( Configuration( (x, y), Directions.STOP ), walls )
+                self.moves[(x, y)] = tuple( possible )
+                self.ghostMoves[(x, y)] = {}
+                for heading in directions:
+                    # As GhostRules.getLegalActions: ghosts cannot stop, and
+                    # only turn around at dead ends
+                    moves = [move for move in possible if move != Directions.STOP]
+                    reverse = Actions.reverseDirection( heading )
+                    if reverse in moves and len( moves ) > 1:
+                        moves.remove( reverse )
+                    self.ghostMoves[(x, y)][heading] = tuple( moves )
+
+    def getPossibleActions( self, config ):
+        "The same list as Actions.getPossibleActions(config, walls)."
+        # Float positions such as (3.0, 4.0) find the same entries as (3, 4)
+        moves = self.moves.get( config.pos )
+        if moves == None: return Actions.getPossibleActions( config, self.walls )
+        return list( moves )
+
+    def getGhostActions( self, config ):
+        "The moves a ghost at config may make, as GhostRules.getLegalActions lists them."
+        headings = self.ghostMoves.get( config.pos )
+        if headings != None: return list( headings[config.direction] )
+        possible = Actions.getPossibleActions( config, self.walls )
+        if Directions.STOP in possible:
+            possible.remove( Directions.STOP )
+        reverse = Actions.reverseDirection( config.direction )
+        if reverse in possible and len( possible ) > 1:
+            possible.remove( reverse )
+        return possible
 
+class FoodView:
+    """
+    An unchangeable record of where the food and capsules are, which a
+    state shares with its successors until something is eaten. Eating
+    makes a new view from the old one and the position eaten (the
+    _foodEaten and _capsuleEaten markers), so nothing is rescanned.
+
+    A view only works out its food set the first time it is asked for,
+    from the nearest view before it that has one, so a game in which
+    nobody looks at the food does not pay for it.
+    """
+    def __init__( self, food=None, capsules=None, parent=None, foodEaten=None, capsuleEaten=None ):
+        self.parent = parent
+        self.foodEaten = foodEaten
+        self.capsuleEaten = capsuleEaten
+        if parent == None:
+            self.width, self.height = food.width, food.height
+            self.grid = food
+            self.capsules = frozenset( capsules )
+        else:
+            self.width, self.height = parent.width, parent.height
+            self.grid = None
+            self.capsules = None
+        self.food = None
+        self.foodList = None
+        self.mask = None
+
+    def eatFood( self, position ):
+        return FoodView( parent=self, foodEaten=position )
+
+    def eatCapsule( self, position ):
+        return FoodView( parent=self, capsuleEaten=position )
+
+    def _build( self ):
+        # Walk back to the nearest view with a food set, and then apply
+        # the changes since then in order. This is a loop rather than a
+        # recursion since many moves can be made without a look at the food.
+        chain = []
+        view = self
+        while view.food == None and view.parent != None:
+            chain.append( view )
+            view = view.parent
+        if view.food == None:
+            view.food = frozenset( view.grid.asList() )
+            view.grid = None
+        for child in reversed( chain ):
+            parent = child.parent
+            child.food, child.capsules = parent.food, parent.capsules
+            if child.foodEaten != None:
+                child.food = child.food - frozenset( [child.foodEaten] )
+            if child.capsuleEaten != None:
+                child.capsules = child.capsules - frozenset( [child.capsuleEaten] )
+            # Once built a view no longer needs the views before it
+            child.parent = None
+
+    def getFood( self ):
+        "The food positions, as a frozenset."
+        if self.food == None: self._build()
+        return self.food
+
+    def getFoodList( self ):
+        "The food positions as a tuple, in the order of Grid.asList()."
+        if self.foodList == None:
+            self.foodList = tuple( sorted( self.getFood() ) )
+        return self.foodList
+
+    def getMask( self ):
+        """
+        The food as a string of width * height bytes, 1 where there is
+        food and 0 elsewhere. The byte for (x, y) is at x * height + y.
+        """
+        if self.mask == None:
+            mask = bytearray( self.width * self.height )
+            for x, y in self.getFood():
+                mask[x * self.height + y] = 1
+            self.mask = str( mask )
+        return self.mask
+
+    def getCapsules( self ):
+        "The capsule positions, as a frozenset."
+        if self.capsules == None: self._build()
+        return self.capsules
+
+class GameStateData(object):
+    """
+    The food, capsules, agent states and layout of a state are kept in
+    _food, _capsules, _agentStates and _layout, which the game rules
+    read directly. Reading food or capsules instead gives this state's
+    own copy, made the first time it is read, so nothing done to what
+    they return can reach any other state. The agent states and the
+    layout are read far more often than they are changed, so agentStates
+    and layout give the objects that may be shared with other states,
+    which must not be changed: code that changes them calls
+    ownAgentState or ownLayout first.
     """
     def __init__( self, prevState = None ):
         """
         Generates a new data packet by copying information from its predecessor.
+
+        The new packet shares the layout, food, capsules and agent states
+        of its predecessor rather than copying them, and from then on
+        neither packet owns them. Whichever part of either is about to be
+        changed is copied first by ownFood, ownCapsules, ownAgentState or
+        ownLayout, and whichever is read through food or capsules is
+        copied first too, so changes never reach the other.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
-            self.layout = prevState.layout
+            self._food = prevState._food
+            self._capsules = prevState._capsules
+            self._agentStates = prevState._agentStates[:]
+            self._layout = prevState._layout
+            prevState._ownFood = False
+            prevState._ownCapsules = False
+            prevState._ownAgents = None
+            prevState._ownLayout = False
             self._eaten = prevState._eaten
             self.score = prevState.score
-
+            # Views never change, so copies can share them
+            self.foodView = prevState.foodView
+            self.numFood = prevState.numFood
+        else:
+            self.foodView = None
+            self.numFood = None
+
+        self._ownFood = False
+        self._ownCapsules = False
+        self._ownAgents = None
+        self._ownLayout = False
+        self._walls = None
         self._foodEaten = None
         self._foodAdded = None
         self._capsuleEaten = None
@@ -393,15 +842,90 @@ class GameStateData:
         self.scoreChange = 0
 
     def deepCopy( self ):
+        """
+        Returns a copy that can be handed to an agent. Nothing is copied
+        until one of the two states changes or hands out a part of itself.
+        """
         state = GameStateData( self )
-        state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def ownFood( self ):
+        "The food grid, copied first if it may be shared with another state."
+        if not self._ownFood:
+            self._food = self._food.copy()
+            self._ownFood = True
+        return self._food
+
+    def ownCapsules( self ):
+        "The list of capsules, copied first if it may be shared with another state."
+        if not self._ownCapsules:
+            self._capsules = self._capsules[:]
+            self._ownCapsules = True
+        return self._capsules
+
+    def ownAgentState( self, index ):
+        "The state of an agent, copied first if it may be shared with another state."
+        if self._ownAgents == None:
+            self._ownAgents = [False for agentState in self._agentStates]
+        if not self._ownAgents[index]:
+            self._agentStates[index] = self._agentStates[index].copy()
+            self._ownAgents[index] = True
+        return self._agentStates[index]
+
+    def ownWalls( self ):
+        """
+        A copy of the layout's walls for this state. The layout itself is
+        shared by every state of a game and never changes.
+        """
+        if self._walls == None:
+            self._walls = self._layout.walls.copy()
+        return self._walls
+
+    def ownLayout( self ):
+        """
+        The layout, copied first if it may be shared with another state,
+        for code that changes it. Copying a layout takes milliseconds, so
+        code that only reads it should use layout instead.
+        """
+        if not self._ownLayout:
+            if self._layout != None: self._layout = self._layout.deepCopy()
+            self._ownLayout = True
+        return self._layout
+
+    def getLayoutKey( self ):
+        "The key of the layout (see Layout.getKey), without copying it."
+        return self._layout.getKey()
+
+    # What is set through these is treated as shared, and copied before
+    # it is changed, or read through food or capsules
+    def _setFood( self, food ):
+        self._food = food
+        self._ownFood = False
+    food = property( ownFood, _setFood )
+
+    def _setCapsules( self, capsules ):
+        self._capsules = capsules
+        self._ownCapsules = False
+    capsules = property( ownCapsules, _setCapsules )
+
+    def _getAgentStates( self ):
+        return self._agentStates
+    def _setAgentStates( self, agentStates ):
+        self._agentStates = agentStates
+        self._ownAgents = None
+    agentStates = property( _getAgentStates, _setAgentStates )
+
+    def _getLayout( self ):
+        return self._layout
+    def _setLayout( self, layout ):
+        self._layout = layout
+        self._ownLayout = False
+    layout = property( _getLayout, _setLayout )
+
     def copyAgentStates( self, agentStates ):
         copiedStates = []
         for agentState in agentStates:
@@ -414,9 +938,9 @@ class GameStateData:
         """
         if other == None: return False
         # TODO Check for type of other
-        if not self.agentStates == other.agentStates: return False
-        if not self.food == other.food: return False
-        if not self.capsules == other.capsules: return False
+        if not self._agentStates == other._agentStates: return False
+        if not self._food == other._food: return False
+        if not self._capsules == other._capsules: return False
         if not self.score == other.score: return False
         return True
 
@@ -424,25 +948,25 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate( self.agentStates ):
+        for i, state in enumerate( self._agentStates ):
             try:
                 int(hash(state))
             except TypeError, e:
                 print e
                 #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        return int((hash(tuple(self._agentStates)) + 13*hash(self._food) + 113* hash(tuple(self._capsules)) + 7 * hash(self.score)) % 1048575 )
 
     def __str__( self ):
-        width, height = self.layout.width, self.layout.height
+        width, height = self._layout.width, self._layout.height
         map = Grid(width, height)
-        if type(self.food) == type((1,2)):
-            self.food = reconstituteGrid(self.food)
+        if type(self._food) == type((1,2)):
+            self._food = reconstituteGrid(self._food)
         for x in range(width):
             for y in range(height):
-                food, walls = self.food, self.layout.walls
+                food, walls = self._food, self._layout.walls
                 map[x][y] = self._foodWallStr(food[x][y], walls[x][y])
 
-        for agentState in self.agentStates:
+        for agentState in self._agentStates:
             if agentState == None: continue
             if agentState.configuration == None: continue
             x,y = [int( i ) for i in nearestPoint( agentState.configuration.pos )]
@@ -452,7 +976,7 @@ class GameStateData:
             else:
                 map[x][y] = self._ghostStr( agent_dir )
 
-        for x, y in self.capsules:
+        for x, y in self._capsules:
             map[x][y] = 'o'
 
         return str(map) + ("\nScore: %d\n" % self.score)
@@ -488,21 +1012,25 @@ class GameStateData:
         """
         Creates an initial game state from a layout array (see layout.py).
         """
-        self.food = layout.food.copy()
+        self._food = layout.food.copy()
         #self.capsules = []
-        self.capsules = layout.capsules[:]
-        self.layout = layout
+        self._capsules = layout.capsules[:]
+        # The view keeps the grid and list, so they must never be changed
+        self.foodView = FoodView( self._food, self._capsules )
+        # The amount of food left, kept up to date by PacmanRules.consume
+        self.numFood = self._food.count()
+        self._layout = layout
         self.score = 0
         self.scoreChange = 0
 
-        self.agentStates = []
+        self._agentStates = []
         numGhosts = 0
         for isPacman, pos in layout.agentPositions:
             if not isPacman:
                 if numGhosts == numGhostAgents: continue # Max ghosts reached already
                 else: numGhosts += 1
-            self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
-        self._eaten = [False for a in self.agentStates]
+            self._agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
+        self._eaten = [False for a in self._agentStates]
 
 try:
     import boinc
@@ -515,7 +1043,7 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, turbo=False ):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -524,6 +1052,11 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        self.turbo = turbo
+        # A gameRecord.RecordWriter that the moves are written to as they are made
+        self.recorder = None
+        # A moveTimer.MoveTimer that times each agent's moves
+        self.moveTimer = None
         self.moveHistory = []
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
@@ -568,8 +1101,10 @@ class Game:
         """
         Main control loop for game play.
         """
+        if self.turbo: return self.runTurbo()
         self.display.initialize(self.state.data)
         self.numMoves = 0
+        if self.recorder != None: self.recorder.startGame(self.state)
 
         ###self.display.initialize(self.state.makeObservation(1).data)
         # inform learning agents of the game start
@@ -616,75 +1151,81 @@ class Game:
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
-            # Generate an observation of the state
-            if 'observationFunction' in dir( agent ):
+            if self.moveTimer != None: self.moveTimer.startMove(agentIndex)
+            # The move is timed however it ends, so that a crash or a
+            # timeout does not leave it open
+            try:
+                # Generate an observation of the state
+                if 'observationFunction' in dir( agent ):
+                    self.mute(agentIndex)
+                    if self.catchExceptions:
+                        try:
+                            timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
+                            try:
+                                start_time = time.time()
+                                observation = timed_func(self.state.deepCopy())
+                            except TimeoutFunctionException:
+                                skip_action = True
+                            move_time += time.time() - start_time
+                            self.unmute()
+                        except Exception,data:
+                            self._agentCrash(agentIndex, quiet=False)
+                            self.unmute()
+                            return
+                    else:
+                        observation = agent.observationFunction(self.state.deepCopy())
+                    self.unmute()
+                else:
+                    observation = self.state.deepCopy()
+
+                # Solicit an action
+                action = None
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
+                        timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                         try:
                             start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            if skip_action:
+                                raise TimeoutFunctionException()
+                            action = timed_func( observation )
                         except TimeoutFunctionException:
-                            skip_action = True
-                        move_time += time.time() - start_time
-                        self.unmute()
-                    except Exception,data:
-                        self._agentCrash(agentIndex, quiet=False)
-                        self.unmute()
-                        return
-                else:
-                    observation = agent.observationFunction(self.state.deepCopy())
-                self.unmute()
-            else:
-                observation = self.state.deepCopy()
-
-            # Solicit an action
-            action = None
-            self.mute(agentIndex)
-            if self.catchExceptions:
-                try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
-                    try:
-                        start_time = time.time()
-                        if skip_action:
-                            raise TimeoutFunctionException()
-                        action = timed_func( observation )
-                    except TimeoutFunctionException:
-                        print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
-                        self.agentTimeout = True
-                        self._agentCrash(agentIndex, quiet=True)
-                        self.unmute()
-                        return
+                            print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
+                            self.agentTimeout = True
+                            self._agentCrash(agentIndex, quiet=True)
+                            self.unmute()
+                            return
 
-                    move_time += time.time() - start_time
+                        move_time += time.time() - start_time
 
-                    if move_time > self.rules.getMoveWarningTime(agentIndex):
-                        self.totalAgentTimeWarnings[agentIndex] += 1
-                        print >>sys.stderr, "Agent %d took too long to make a move! This is warning %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
-                        if self.totalAgentTimeWarnings[agentIndex] > self.rules.getMaxTimeWarnings(agentIndex):
-                            print >>sys.stderr, "Agent %d exceeded the maximum number of warnings: %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                        if move_time > self.rules.getMoveWarningTime(agentIndex):
+                            self.totalAgentTimeWarnings[agentIndex] += 1
+                            print >>sys.stderr, "Agent %d took too long to make a move! This is warning %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                            if self.totalAgentTimeWarnings[agentIndex] > self.rules.getMaxTimeWarnings(agentIndex):
+                                print >>sys.stderr, "Agent %d exceeded the maximum number of warnings: %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                                self.agentTimeout = True
+                                self._agentCrash(agentIndex, quiet=True)
+                                self.unmute()
+                                return
+
+                        self.totalAgentTimes[agentIndex] += move_time
+                        #print "Agent: %d, time: %f, total: %f" % (agentIndex, move_time, self.totalAgentTimes[agentIndex])
+                        if self.totalAgentTimes[agentIndex] > self.rules.getMaxTotalTime(agentIndex):
+                            print >>sys.stderr, "Agent %d ran out of time! (time: %1.2f)" % (agentIndex, self.totalAgentTimes[agentIndex])
                             self.agentTimeout = True
                             self._agentCrash(agentIndex, quiet=True)
                             self.unmute()
                             return
-
-                    self.totalAgentTimes[agentIndex] += move_time
-                    #print "Agent: %d, time: %f, total: %f" % (agentIndex, move_time, self.totalAgentTimes[agentIndex])
-                    if self.totalAgentTimes[agentIndex] > self.rules.getMaxTotalTime(agentIndex):
-                        print >>sys.stderr, "Agent %d ran out of time! (time: %1.2f)" % (agentIndex, self.totalAgentTimes[agentIndex])
-                        self.agentTimeout = True
-                        self._agentCrash(agentIndex, quiet=True)
+                        self.unmute()
+                    except Exception,data:
+                        self._agentCrash(agentIndex)
                         self.unmute()
                         return
-                    self.unmute()
-                except Exception,data:
-                    self._agentCrash(agentIndex)
-                    self.unmute()
-                    return
-            else:
-                action = agent.getAction(observation)
-            self.unmute()
+                else:
+                    action = agent.getAction(observation)
+                self.unmute()
+            finally:
+                if self.moveTimer != None: self.moveTimer.endMove(agentIndex)
 
             # Execute the action
             self.moveHistory.append( (agentIndex, action) )
@@ -698,6 +1239,7 @@ class Game:
                     return
             else:
                 self.state = self.state.generateSuccessor( agentIndex, action )
+            if self.recorder != None: self.recorder.recordMove( agentIndex, action, self.state )
 
             # Change the display
             self.display.update( self.state.data )
@@ -714,6 +1256,8 @@ class Game:
             if _BOINC_ENABLED:
                 boinc.set_fraction_done(self.getProgress())
 
+        if self.recorder != None: self.recorder.endGame(self.state)
+
         # inform a learning agent of the game result
         for agentIndex, agent in enumerate(self.agents):
             if "final" in dir( agent ) :
@@ -727,3 +1271,46 @@ class Game:
                     self.unmute()
                     return
         self.display.finish()
+
+    def runTurbo( self ):
+        """
+        The control loop for games that nobody watches. There is no
+        display, muting, time limit or exception handling, and each agent's
+        hooks are looked up once rather than with dir() on every move.
+        Otherwise the game is played exactly as run() would play it, so
+        it has the same outcome from the same random seed.
+        """
+        self.numMoves = 0
+        if self.recorder != None: self.recorder.startGame(self.state)
+        observers = []
+        for i, agent in enumerate( self.agents ):
+            if not agent:
+                print >>sys.stderr, "Agent %d failed to load" % i
+                self._agentCrash(i, quiet=True)
+                return
+            if hasattr( agent, 'registerInitialState' ):
+                agent.registerInitialState(self.state.deepCopy())
+            observers.append( getattr( agent, 'observationFunction', None ) )
+        getActions = [agent.getAction for agent in self.agents]
+
+        agentIndex = self.startingIndex
+        numAgents = len( self.agents )
+        while not self.gameOver:
+            if self.moveTimer != None: self.moveTimer.startMove(agentIndex)
+            try:
+                observation = self.state.deepCopy()
+                if observers[agentIndex] != None:
+                    observation = observers[agentIndex]( observation )
+                action = getActions[agentIndex]( observation )
+            finally:
+                if self.moveTimer != None: self.moveTimer.endMove(agentIndex)
+            self.moveHistory.append( (agentIndex, action) )
+            self.state = self.state.generateSuccessor( agentIndex, action )
+            if self.recorder != None: self.recorder.recordMove( agentIndex, action, self.state )
+            self.rules.process(self.state, self)
+            agentIndex = ( agentIndex + 1 ) % numAgents
+
+        if self.recorder != None: self.recorder.endGame(self.state)
+        for agent in self.agents:
+            if hasattr( agent, 'final' ):
+                agent.final( self.state )
@@ -0,0 +1,504 @@
+# gameRecord.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Compact records of played games, written while the games are played.
+
+A record file starts with MAGIC and then holds any number of games, one
+after another. Each block starts with a one letter tag:
+
+  L  a layout: the sha1 of its text, the length of the text and the text.
+     Written the first time a file needs the layout.
+  G  the start of a game: the sha1 of its layout, the number of agents
+     and how many moves apart its checksums are.
+  M  one move: the agent's index and the action, one byte each.
+  C  a checksum of the state after a move: the number of the move and
+     the crc32 of the state (see stateChecksum).
+  K  a keyframe: the number of a move, the length of a snapshot of the
+     state after it and the snapshot (see packState). A Replay starts
+     from the nearest keyframe rather than from the first move.
+  E  the end of a game: the number of moves, the final score and
+     whether Pacman won or lost.
+
+Blocks are only ever added to the end of a file, and the writer flushes
+each one, so a game that crashes keeps every move made before the crash
+(it just has no E block). To record games from pacman.py use -r, and to
+turn the pickled recordings of earlier versions into a record file run
+
+  python gameRecord.py convert recorded-game-1-... recorded-game-2-... -o games.rec
+
+To look at the boards that lost games ended on, without animating them, run
+
+  python gameRecord.py final --lost games.rec
+"""
+
+from game import Directions
+import bisect
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = 'PACREC\x01'
+# How many moves apart the checksums are, or 0 for none
+CHECKSUM_INTERVAL = 50
+# How many moves apart the keyframes are, or 0 for none
+KEYFRAME_INTERVAL = 200
+
+# The actions, in the order of their codes in M blocks
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+ACTION_CODES = dict((action, code) for code, action in enumerate(ACTIONS))
+
+LAYOUT_BLOCK = struct.Struct('<c20sI')
+GAME_BLOCK = struct.Struct('<c20sBH')
+MOVE_BLOCK = struct.Struct('<cBB')
+CHECKSUM_BLOCK = struct.Struct('<cII')
+END_BLOCK = struct.Struct('<cIdB')
+KEYFRAME_BLOCK = struct.Struct('<cII')
+
+# A snapshot starts with the score, whether the game is won (1) or lost
+# (2), and the numbers of agents, food ints and capsules that follow it
+STATE_FIELDS = struct.Struct('<iBBHH')
+# Each agent: which of x and y are floats (1 and 2), x, y, the direction,
+# the scared timer and the food carried and returned
+AGENT_FIELDS = struct.Struct('<BddBHHH')
+
+# The results kept in E blocks
+UNFINISHED, WON, LOST = 0, 1, 2
+
+def stateChecksum(state):
+    """
+    A crc32 of everything that can change in a game: the agents, the
+    score, the capsules and the food. It is the same for the same state
+    whichever grid backend stores the food.
+    """
+    data = state.data
+    agents = [(agent.configuration.pos, agent.configuration.direction, agent.scaredTimer)
+              for agent in data._agentStates]
+    summary = repr((agents, data.score, sorted(data._capsules), data._food.packBits()))
+    return zlib.crc32(summary) & 0xffffffff
+
+def packState(state):
+    "A snapshot of everything in state that can change in a game, for a K block."
+    data = state.data
+    foodInts = data._food.packBits()[2:]
+    flags = 0
+    if state.isWin(): flags = 1
+    elif state.isLose(): flags = 2
+    parts = [STATE_FIELDS.pack(data.score, flags, len(data._agentStates), len(foodInts), len(data._capsules))]
+    for agent in data._agentStates:
+        x, y = agent.configuration.pos
+        floats = (type(x) == float) + 2 * (type(y) == float)
+        parts.append(AGENT_FIELDS.pack(floats, x, y, ACTION_CODES[agent.configuration.direction],
+                                       agent.scaredTimer, agent.numCarrying, agent.numReturned))
+    parts.append(struct.pack('<%dI' % len(foodInts), *foodInts))
+    for x, y in data._capsules:
+        parts.append(struct.pack('<BB', x, y))
+    return ''.join(parts)
+
+def unpackState(snapshot, initialState):
+    """
+    The state that packState took snapshot of, rebuilt on a copy of the
+    first state of its game (which supplies the layout and the agents'
+    starting positions).
+    """
+    from game import Configuration, FoodView
+    score, flags, numAgents, numInts, numCapsules = STATE_FIELDS.unpack_from(snapshot)
+    offset = STATE_FIELDS.size
+    state = initialState.deepCopy()
+    data = state.data
+    for index in range(numAgents):
+        floats, x, y, direction, scaredTimer, numCarrying, numReturned = AGENT_FIELDS.unpack_from(snapshot, offset)
+        offset += AGENT_FIELDS.size
+        if not floats & 1: x = int(x)
+        if not floats & 2: y = int(y)
+        agent = data.ownAgentState(index)
+        agent.configuration = Configuration((x, y), ACTIONS[direction])
+        agent.scaredTimer = scaredTimer
+        agent.numCarrying = numCarrying
+        agent.numReturned = numReturned
+    foodInts = struct.unpack_from('<%dI' % numInts, snapshot, offset)
+    offset += 4 * numInts
+    capsules = [struct.unpack_from('<BB', snapshot, offset + 2 * i) for i in range(numCapsules)]
+    food = data._food
+    data.food = food.__class__(food.width, food.height, bitRepresentation=foodInts)
+    data.capsules = capsules
+    data.foodView = FoodView(data._food, data._capsules)
+    data.numFood = data._food.count()
+    data.score = score
+    data._win = flags == 1
+    data._lose = flags == 2
+    return state
+
+class RecordWriter:
+    """
+    Adds games to the end of a record file, one move at a time:
+
+      writer = RecordWriter('games.rec')
+      writer.startGame(state)
+      writer.recordMove(agentIndex, action, nextState)
+      ...
+      writer.endGame(finalState)
+
+    Game.run does this for a game whose recorder is set. A block left cut
+    short at the end of the file by a crash is cut off before the writer
+    adds to it.
+    """
+
+    def __init__(self, path, checksumInterval=CHECKSUM_INTERVAL, keyframeInterval=KEYFRAME_INTERVAL):
+        self.path = path
+        self.checksumInterval = checksumInterval
+        self.keyframeInterval = keyframeInterval
+        self.layouts = set()
+        end = 0
+        if os.path.exists(path):
+            # Only the layouts already in the file are needed from it
+            blocks, end = readBlocks(path)
+            for block in blocks:
+                if block[0] == 'L': self.layouts.add(block[1])
+            if end < os.path.getsize(path):
+                # Cut off a block left unfinished by a crash, or the blocks
+                # written after it would be read as a part of it
+                f = open(path, 'r+b')
+                try:
+                    f.truncate(end)
+                finally:
+                    f.close()
+        self.file = open(path, 'ab')
+        if end == 0: self.write(MAGIC)
+        self.numMoves = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.file.flush()
+
+    def startGame(self, state):
+        text = state.getLayoutKey()
+        key = hashlib.sha1(text).digest()
+        if key not in self.layouts:
+            self.write(LAYOUT_BLOCK.pack('L', key, len(text)) + text)
+            self.layouts.add(key)
+        self.write(GAME_BLOCK.pack('G', key, state.getNumAgents(), self.checksumInterval))
+        self.numMoves = 0
+
+    def recordMove(self, agentIndex, action, state):
+        "Records that agentIndex took action, which led to state."
+        self.numMoves += 1
+        block = MOVE_BLOCK.pack('M', agentIndex, ACTION_CODES[action])
+        if self.checksumInterval and self.numMoves % self.checksumInterval == 0:
+            block += CHECKSUM_BLOCK.pack('C', self.numMoves, stateChecksum(state))
+        if self.keyframeInterval and self.numMoves % self.keyframeInterval == 0:
+            snapshot = packState(state)
+            block += KEYFRAME_BLOCK.pack('K', self.numMoves, len(snapshot)) + snapshot
+        self.write(block)
+
+    def endGame(self, state):
+        result = UNFINISHED
+        if state.isWin(): result = WON
+        elif state.isLose(): result = LOST
+        self.write(END_BLOCK.pack('E', self.numMoves, state.getScore(), result))
+
+    def writeGame(self, initialState, moves):
+        """
+        Records a whole game that was played somewhere else, from its first
+        state and its moves, replaying it to work out the checksums. A game
+        that did not finish is left without an end, as Game.run leaves it.
+        """
+        state = initialState
+        self.startGame(state)
+        for number, (agentIndex, action) in enumerate(moves):
+            try:
+                state = state.generateSuccessor(agentIndex, action)
+            except Exception:
+                # Only the last move can be the one that crashed the game;
+                # like Game.run, leave that game without an end
+                if number + 1 < len(moves): raise
+                return
+            self.recordMove(agentIndex, action, state)
+        if state.isWin() or state.isLose():
+            self.endGame(state)
+
+    def close(self):
+        self.file.close()
+
+class GameRecord:
+    """
+    One game read from a record file. moves is a list of (agentIndex,
+    action) pairs, as in Game.moveHistory, and checksums and keyframes
+    map a move number to the checksum or snapshot of the state after
+    that move. finished is False for a game that stopped before its E
+    block was written.
+    """
+
+    def __init__(self, layoutText, numAgents, checksumInterval):
+        self.layoutText = layoutText
+        self.numAgents = numAgents
+        self.checksumInterval = checksumInterval
+        self.moves = []
+        self.checksums = {}
+        self.keyframes = {}
+        self.finished = False
+        self.score = None
+        self.result = UNFINISHED
+
+    def getLayout(self):
+        import layout
+        return layout.Layout(self.layoutText.split('\n'))
+
+    def getInitialState(self, lay=None):
+        import pacman
+        if lay == None: lay = self.getLayout()
+        state = pacman.GameState()
+        state.initialize(lay, self.numAgents - 1)
+        return state
+
+    def replay(self, verify=True):
+        """
+        Plays the moves again, without a display, and returns the final
+        state. With verify, checks each state that has a checksum against
+        it and raises an exception at the first that differs.
+        """
+        state = self.getInitialState()
+        for number, (agentIndex, action) in enumerate(self.moves):
+            state = state.generateSuccessor(agentIndex, action)
+            if verify and number + 1 in self.checksums:
+                if stateChecksum(state) != self.checksums[number + 1]:
+                    raise Exception('The replayed game differs from the record after move %d' % (number + 1))
+        return state
+
+class Replay:
+    """
+    Moves back and forth through a recorded game without a display:
+
+      replay = Replay(record)
+      replay.seek(2000)       # the state after move 2000
+      replay.stepBack()       # the state after move 1999
+      replay.step()           # and after move 2000 again
+      replay.toEnd()          # the final state
+
+    Each state is rebuilt from the nearest keyframe at or before it, or
+    from the state the replay is at if that is nearer, so no seek plays
+    more moves than there are between two keyframes. The states played
+    since the last keyframe are kept, so stepping back is cheap. With
+    verify, each state that has a checksum is checked against it.
+    """
+
+    def __init__(self, record, verify=False):
+        self.record = record
+        self.verify = verify
+        self.initialState = record.getInitialState()
+        self.keyframeNumbers = sorted(record.keyframes)
+        # states[i] is the state after move base + i
+        self.base = 0
+        self.states = [self.initialState]
+        self.index = 0
+        self.state = self.initialState
+
+    def getNumMoves(self):
+        return len(self.record.moves)
+
+    def keyframeBefore(self, index):
+        "The number of the last move at or before index that has a keyframe, or 0."
+        position = bisect.bisect_right(self.keyframeNumbers, index)
+        if position == 0: return 0
+        return self.keyframeNumbers[position - 1]
+
+    def seek(self, index):
+        "Moves to the state after move index (0 is the start) and returns it."
+        if index < 0 or index > self.getNumMoves():
+            raise Exception('The game has no move %d' % index)
+        keyframe = self.keyframeBefore(index)
+        last = self.base + len(self.states) - 1
+        if not (self.base <= index and keyframe <= last):
+            self.base = keyframe
+            if keyframe == 0: self.states = [self.initialState]
+            else: self.states = [unpackState(self.record.keyframes[keyframe], self.initialState)]
+        while self.base + len(self.states) - 1 < index:
+            number = self.base + len(self.states)
+            agentIndex, action = self.record.moves[number - 1]
+            state = self.states[-1].generateSuccessor(agentIndex, action)
+            if self.verify and number in self.record.checksums:
+                if stateChecksum(state) != self.record.checksums[number]:
+                    raise Exception('The replayed game differs from the record after move %d' % number)
+            if number in self.record.keyframes:
+                # Earlier states can be rebuilt from the keyframes
+                self.base = number
+                self.states = [state]
+            else:
+                self.states.append(state)
+        self.index = index
+        self.state = self.states[index - self.base]
+        return self.state
+
+    def step(self):
+        return self.seek(self.index + 1)
+
+    def stepBack(self):
+        return self.seek(self.index - 1)
+
+    def toEnd(self):
+        return self.seek(self.getNumMoves())
+
+def readBlocks(path):
+    """
+    The blocks of a record file as a list of tuples, tag first, and the
+    offset in the file at which the last complete block ends. A block cut
+    short at the end of the file (by a crash while it was written) is
+    left out, and so is the start of a file that was cut short before the
+    header was written in full; its blocks are then an empty list and the
+    offset is 0.
+    """
+    f = open(path, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    if len(data) < len(MAGIC) and MAGIC.startswith(data):
+        return [], 0
+    if not data.startswith(MAGIC):
+        raise Exception(path + ' is not a game record file')
+    blocks = []
+    offset = len(MAGIC)
+    formats = {'G': GAME_BLOCK, 'M': MOVE_BLOCK, 'C': CHECKSUM_BLOCK, 'E': END_BLOCK}
+    while offset < len(data):
+        tag = data[offset]
+        if tag == 'L' or tag == 'K':
+            # A layout or a keyframe: a header, then that many bytes
+            header = tag == 'L' and LAYOUT_BLOCK or KEYFRAME_BLOCK
+            if offset + header.size > len(data): break
+            tag, key, length = header.unpack_from(data, offset)
+            start = offset + header.size
+            if start + length > len(data): break
+            blocks.append((tag, key, data[start:start + length]))
+            offset = start + length
+        elif tag in formats:
+            if offset + formats[tag].size > len(data): break
+            blocks.append(formats[tag].unpack_from(data, offset))
+            offset += formats[tag].size
+        else:
+            raise Exception('Unknown block %r at byte %d of %s' % (tag, offset, path))
+    return blocks, offset
+
+def readRecords(path):
+    "The games in a record file, as a list of GameRecords in the order they were played."
+    layouts = {}
+    games = []
+    blocks, end = readBlocks(path)
+    for block in blocks:
+        tag = block[0]
+        if tag == 'L':
+            layouts[block[1]] = block[2]
+        elif tag == 'G':
+            games.append(GameRecord(layouts[block[1]], block[2], block[3]))
+        elif tag == 'M':
+            games[-1].moves.append((block[1], ACTIONS[block[2]]))
+        elif tag == 'C':
+            games[-1].checksums[block[1]] = block[2]
+        elif tag == 'K':
+            games[-1].keyframes[block[1]] = block[2]
+        elif tag == 'E':
+            games[-1].finished = True
+            games[-1].score = block[2]
+            games[-1].result = block[3]
+    return games
+
+def isRecordFile(path):
+    f = open(path, 'rb')
+    try:
+        return f.read(len(MAGIC)) == MAGIC
+    finally:
+        f.close()
+
+def convertPickles(paths, outPath, checksumInterval=CHECKSUM_INTERVAL, keyframeInterval=KEYFRAME_INTERVAL):
+    """
+    Adds the games pickled by earlier versions of pacman.py -r (a dict of
+    'layout' and 'actions') to the record file at outPath. Only convert
+    pickles you trust: loading one can run any code.
+    """
+    import cPickle, layout, pacman
+    writer = RecordWriter(outPath, checksumInterval, keyframeInterval)
+    try:
+        for path in paths:
+            f = open(path, 'rb')
+            try:
+                recorded = cPickle.load(f)
+            finally:
+                f.close()
+            # The pickled layout is rebuilt from its text, since it lacks
+            # what later versions of Layout work out when they are made
+            lay = layout.Layout(recorded['layout'].layoutText)
+            moves = recorded['actions']
+            # As pacman.py replays them, with a ghost for each one in the
+            # layout, whether or not it got to move
+            numGhosts = lay.getNumGhosts()
+            for agentIndex, action in moves:
+                if agentIndex > numGhosts:
+                    raise Exception('%s has a move by agent %d, but its layout only has %d ghosts' % (path, agentIndex, numGhosts))
+            state = pacman.GameState()
+            state.initialize(lay, numGhosts)
+            writer.writeGame(state, moves)
+    finally:
+        writer.close()
+
+def describe(path):
+    for i, record in enumerate(readRecords(path)):
+        result = ['unfinished', 'won', 'lost'][record.result]
+        print 'Game %d: %d agents, %d moves, %s' % (i + 1, record.numAgents, len(record.moves), result),
+        if record.finished: print 'with a score of %d' % record.score
+        else: print
+
+def showFinalStates(path, onlyLost=False):
+    "Prints the board each game in a record file ended on, or only the lost games'."
+    for i, record in enumerate(readRecords(path)):
+        if onlyLost and record.result != LOST: continue
+        print 'Game %d, after %d moves:' % (i + 1, len(record.moves))
+        print Replay(record).toEnd()
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python gameRecord.py convert <pickled games> -o <record file>
+                python gameRecord.py show <record file>
+                python gameRecord.py verify <record file>
+                python gameRecord.py final [--lost] <record file>
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-o', '--output', dest='output', help='the record file to add the converted games to')
+    parser.add_option('--checksums', dest='checksums', type='int', default=CHECKSUM_INTERVAL,
+                      help='how many moves apart the checksums of converted games are, 0 for none [Default: %default]')
+    parser.add_option('--keyframes', dest='keyframes', type='int', default=KEYFRAME_INTERVAL,
+                      help='how many moves apart the keyframes of converted games are, 0 for none [Default: %default]')
+    parser.add_option('--lost', action='store_true', dest='lost', default=False,
+                      help='only show the final boards of games Pacman lost')
+    options, args = parser.parse_args(sys.argv[1:])
+    if len(args) < 2: parser.error('Expected a command and files')
+    command, paths = args[0], args[1:]
+    if command == 'convert':
+        if options.output == None: parser.error('convert needs -o')
+        convertPickles(paths, options.output, options.checksums, options.keyframes)
+        describe(options.output)
+    elif command == 'show':
+        for path in paths: describe(path)
+    elif command == 'verify':
+        for path in paths:
+            for i, record in enumerate(readRecords(path)):
+                state = record.replay()
+                if record.finished and state.getScore() != record.score:
+                    raise Exception('Game %d ends with a score of %d, not %d' % (i + 1, state.getScore(), record.score))
+            print '%s: all games replay as recorded' % path
+    elif command == 'final':
+        for path in paths: showFinalStates(path, options.lost)
+    else:
+        parser.error('Unknown command ' + command)
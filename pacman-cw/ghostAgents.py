@@ -17,6 +17,7 @@ from game import Actions
 from game import Directions
 import random
 from util import manhattanDistance
+import distanceCalculator
 import util
 
 class GhostAgent( Agent ):
@@ -63,8 +64,9 @@ class DirectionalGhost( GhostAgent ):
         newPositions = [( pos[0]+a[0], pos[1]+a[1] ) for a in actionVectors]
         pacmanPosition = state.getPacmanPosition()
 
-        # Select best actions given the state
-        distancesToPacman = [manhattanDistance( pos, pacmanPosition ) for pos in newPositions]
+        # Select best actions given the state, by the distance through the maze
+        distancer = distanceCalculator.getStateDistancer( state )
+        distancesToPacman = [distancer.getDistance( pos, pacmanPosition ) for pos in newPositions]
         if isScared:
             bestScore = max( distancesToPacman )
             bestProb = self.prob_scaredFlee
@@ -13,7 +13,11 @@
 
 
 from util import manhattanDistance
+from game import ActionTable
 from game import Grid
+from game import makeGrid
+import distanceCalculator
+import glob
 import os
 import random
 
@@ -27,14 +31,15 @@ class Layout:
     def __init__(self, layoutText):
         self.width = len(layoutText[0])
         self.height= len(layoutText)
-        self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
+        self.walls = makeGrid(self.width, self.height, False)
+        self.food = makeGrid(self.width, self.height, False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.actionTable = ActionTable(self.walls)
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -79,7 +84,13 @@ class Layout:
 
     def getFurthestCorner(self, pacPos):
         poses = [(1,1), (1, self.height - 2), (self.width - 2, 1), (self.width - 2, self.height - 2)]
-        dist, pos = max([(manhattanDistance(p, pacPos), p) for p in poses])
+        # Corners that are walls or cut off from Pacman have no maze distance
+        distancer = distanceCalculator.getDistancer(self)
+        reachable = [(distancer.getDistance(p, pacPos), p) for p in poses]
+        reachable = [(dist, p) for dist, p in reachable if dist != distanceCalculator.UNREACHABLE]
+        if len(reachable) == 0:
+            reachable = [(manhattanDistance(p, pacPos), p) for p in poses]
+        dist, pos = max(reachable)
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
@@ -92,6 +103,15 @@ class Layout:
     def deepCopy(self):
         return Layout(self.layoutText[:])
 
+    def getKey(self):
+        """
+        The text of the layout. Everything that is worked out once for a
+        layout and shared by the games on it (maze distances, transition
+        tables and so on) is kept by this key, so copies of a layout share
+        them too.
+        """
+        return "\n".join(self.layoutText)
+
     def processLayoutText(self, layoutText):
         """
         Coordinates are flipped from the input format to the (x,y) convention here
@@ -142,6 +162,19 @@ def getLayout(name, back = 2):
         os.chdir(curdir)
     return layout
 
+def findLayouts(pattern):
+    """
+    The names of the layouts in layouts/ that match a shell pattern, such
+    as '*Classic', or just the pattern if it names a single layout.
+    """
+    if not glob.has_magic(pattern):
+        return [pattern]
+    names = [os.path.basename(path)[:-len('.lay')]
+             for path in glob.glob(os.path.join('layouts', pattern + '.lay'))]
+    if len(names) == 0:
+        raise Exception('No layouts match ' + pattern)
+    return sorted(names)
+
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
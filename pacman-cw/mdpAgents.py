@@ -34,6 +34,32 @@ import api
 import random
 import game
 import util
+import mdpSolvers
+
+
+def isSet(flag):
+    # Read an on/off option given with -a. A bare "-a name" comes through as 1.
+    return str(flag).lower() in ["1", "true", "yes", "on"]
+
+
+# The rewards and settings of value iteration that can be tuned with -a,
+# for example -a gamma=0.8,ghost_reward=-500 (see sweep.py). Every one
+# of them is read by both agents.
+PARAMETERS = ["food_reward", "capsule_reward", "ghost_reward", "ignore_ghost_reward",
+              "empty_reward", "current_reward", "iteration", "reward", "gamma"]
+
+
+def setParameters(agent, params):
+    # Override the agent's defaults with the parameters given with -a,
+    # converting each to the type of its default. Whole numbers may be
+    # written as floats (iteration=200.0), as a random sweep draws them.
+    for name, value in params.items():
+        if name not in PARAMETERS:
+            raise Exception("Unknown option " + name + " for " + agent.__class__.__name__)
+        if type(getattr(agent, name)) == int:
+            setattr(agent, name, int(float(value)))
+        else:
+            setattr(agent, name, float(value))
 
 
 class Grid:
@@ -87,9 +113,55 @@ class Grid:
 class MDPAgent(Agent):
 
     # Constructor: this gets run when we first invoke pacman.py
-    def __init__(self):
+    #
+    # solver picks the backend used for value iteration, and can be set
+    # with -a solver=NAME. "dict" is the loop in valueIteration below,
+    # the others are in mdpSolvers.py. "policy" runs policy iteration
+    # instead, which needs scipy.
+    #
+    # stop says when value iteration ends: "fixed" always runs
+    # self.iteration sweeps, "residual" stops as soon as the utilities
+    # are within epsilon of converged (-a stop=residual,epsilon=0.01).
+    #
+    # warm starts value iteration on each move from the utilities of the
+    # move before (-a warm), which pays off with stop=residual.
+    #
+    # backups caps the number of cell updates per move for the
+    # prioritized solver (-a solver=prioritized,backups=2000).
+    #
+    # budget is a time limit for each move in milliseconds. Value
+    # iteration stops at the end of the first sweep after it runs out,
+    # and the move is made from the utilities reached by then. This
+    # keeps big layouts inside the move time limit of pacman.py -c
+    # (-a budget=200).
+    #
+    # verbose prints how many sweeps value iteration made, and how often
+    # it ran out of the budget, at the end of each game (-a verbose).
+    #
+    # Any of the PARAMETERS set at the end can be changed with -a too.
+    def __init__(self, solver="dict", stop="fixed", epsilon=0.01, warm=False, backups=None, budget=None,
+                 verbose=False, **params):
         print "Starting up MDPAgent!"
         name = "Pacman"
+        self.solverName = solver
+        self.maxBackups = backups
+        if backups is not None:
+            self.maxBackups = int(backups)
+        if stop not in ["fixed", "residual"]:
+            raise Exception("Unknown stop mode " + str(stop) + ", expected fixed or residual")
+        self.stop = stop
+        self.epsilon = float(epsilon)
+        self.warm = isSet(warm)
+        self.budget = budget
+        if budget is not None:
+            self.budget = float(budget)
+        self.verbose = isSet(verbose)
+        # Record the sweeps and final residual of value iteration for each move
+        self.solveStats = []
+        # Record how many moves ran out of the time budget
+        self.budgetHits = 0
+        # Record the value map of the last move, to warm start the next one
+        self.previousValues = None
         # Record the last decision made
         self.last = Directions.STOP
         # Record locations that pacman has traveled to
@@ -99,10 +171,11 @@ class MDPAgent(Agent):
         self.wall_locations = []
         self.capsule_locations = []
         # Reward for different kinds of location to incentivise or discourage pacman from going to them
+        # The food reward is for the first move; after that each food is worth
+        # food_reward * 1000 divided by the food left, so the last few are worth the most
         self.food_reward = 10.0
         self.capsule_reward = 10.0
         self.ghost_reward = -20.0
-        self.near_ignore_ghost_reward = 10.0
         self.ignore_ghost_reward = 20.0
         self.empty_reward = -5.0
         self.current_reward = -5.0
@@ -111,6 +184,9 @@ class MDPAgent(Agent):
         # The base reward and gamma used for the Bellman Equation
         self.reward = 0.0
         self.gamma = 0.9
+        setParameters(self, params)
+        # The reward for food on this move, worked out from food_reward
+        self.food_value = self.food_reward
 
     # Gets run after an MDPAgent object is created and once there is
     # game state to access.
@@ -121,17 +197,39 @@ class MDPAgent(Agent):
         # Create map and add walls to map
         self.makeMap(state)
         self.addWallsToMap(state)
+        # Set up the motion model and the solver for this map
+        # The transition table is only built the first time a layout is seen
+        self.transitions = mdpSolvers.getTransitionTable(
+            api.layoutKey(state), api.walls(state), self.map.getWidth(), self.map.getHeight())
+        self.solver = mdpSolvers.getSolver(
+            self.solverName, self.transitions, self.iteration, self.maxBackups)
+        # Set up the warning around ghosts. For larger maps it reaches 3 steps from a ghost,
+        # halving with each step, and for smaller maps it is half the ghost reward up to 2 steps away
+        if self.map.getWidth() >= 8 or self.map.getHeight() >= 8:
+            penalties = [self.ghost_reward, self.ghost_reward / 2,
+                         self.ghost_reward / 4, self.ghost_reward / 8]
+        else:
+            penalties = [self.ghost_reward, self.ghost_reward / 2, self.ghost_reward / 2]
+        self.danger = mdpSolvers.DangerField(api.mazeDistancer(state), penalties)
+        self.solveStats = []
+        self.budgetHits = 0
+        self.previousValues = None
 
     # This is what gets run in between multiple games
     def final(self, state):
         print "Looks like the game just ended!"
+        if self.verbose:
+            print mdpSolvers.summariseStats(self.solveStats)
+            if self.budget is not None:
+                print mdpSolvers.summariseBudget(self.budget, self.budgetHits, len(self.solveStats))
         # Reset the lists when a game finishes to not ruin the next round
+        self.previousValues = None
         self.traveled = []
         self.food_locations = []
         self.wall_locations = []
         self.capsule_locations = []
 
-        self.food_reward = 10.0
+        self.food_value = self.food_reward
 
     def getMapDimension(self, corners):
         # Adapted from Lab Solutions 5 (Parsons, 2017)
@@ -173,12 +271,13 @@ class MDPAgent(Agent):
 
     def makeValueMap(self, state):
         # Get the most updated information about the map
-        foods = api.food(state)
-        walls = api.walls(state)
-        capsules = api.capsules(state)
-        ghosts = api.ghostStates(state)
-        current_location = api.whereAmI(state)
-        corners = api.corners(state)
+        observation = api.observe(state)
+        foods = observation.food
+        walls = observation.walls
+        capsules = observation.capsules
+        ghosts = observation.ghostStates
+        current_location = observation.position
+        corners = observation.corners
 
         # Create empty dictionary to store the values of each location in format of (x, y): value
         valueMap = {}
@@ -194,7 +293,7 @@ class MDPAgent(Agent):
             if food not in self.food_locations:
                 self.food_locations.append(food)
         self.food_dictionary = dict.fromkeys(
-            self.food_locations, self.food_reward)
+            self.food_locations, self.food_value)
         valueMap.update(self.food_dictionary)
 
         # Similar logic to the previous part but for capsules
@@ -216,19 +315,20 @@ class MDPAgent(Agent):
         width, height = self.getMapDimension(corners)
         for i in range(width-1):
             for j in range(height-1):
-                if (i, j) not in valueMap.keys():
+                if (i, j) not in valueMap:
                     valueMap[(i, j)] = self.empty_reward
 
         # Update valueMap with the location of the ghost by changing the reward to ghost_reward
+        # The entry is keyed by the whole ghost state, so it does not change the reward at the
+        # ghost's location itself; valueIteration does that
         for ghost in ghosts:
-            for location in valueMap.keys():
-                if ghost[0] == location:
-                    if ghost[1] != 1:
-                        valueMap[ghost] = self.ghost_reward
-                    else:
-                        valueMap[ghost] = self.ignore_ghost_reward
+            if ghost[0] in valueMap:
+                if ghost[1] != 1:
+                    valueMap[ghost] = self.ghost_reward
+                else:
+                    valueMap[ghost] = self.ignore_ghost_reward
 
-        self.food_reward = 10000 / len(foods)
+        self.food_value = int(self.food_reward * 1000) / len(foods)
 
         valueMap[current_location] = self.current_reward
 
@@ -282,102 +382,82 @@ class MDPAgent(Agent):
         return self.valueMap, self.util_dict
 
     def getValueOfMove(self, x, y, valueMap):
-
-        self.valueMap = valueMap
-
-        # Update value map with the utility of the 4 moves
-        self.valueMap, self.util_dict = self.calculateDirections(
-            x, y, valueMap)
-
+        # This does the same sums as calculateDirections, but looks the neighbouring cells up in the
+        # transition table for this layout rather than working them out again on every sweep
         # find the max utility that is possible
-        self.valueMap[(x, y)] = max(self.util_dict.values())
+        valueMap[(x, y)] = self.transitions.bestMoveUtility(valueMap, (x, y))
 
-        return self.valueMap[(x, y)]
+        return valueMap[(x, y)]
 
-    def valueIteration(self, state, reward, gamma, V1):
+    def valueIteration(self, state, reward, gamma, V1, deadline=None):
         # iterate through the valueMap using the Bellman update
         # Get the current information on the map regarding walls, foods, capsules, ghosts, etc
-        walls = api.walls(state)
-        foods = api.food(state)
-        capsules = api.capsules(state)
-        ghosts = api.ghosts(state)
+        observation = api.observe(state)
+        walls = observation.walls
+        foods = observation.food
+        capsules = observation.capsules
+        ghosts = observation.ghosts
 
-        ghostsStates = api.ghostStatesWithTimes(state)
-        corners = api.corners(state)
+        ghostsStates = observation.ghostStatesWithTimes
+        corners = observation.corners
 
         width, height = self.getMapDimension(corners)
         # Find locations near ghosts and set them to a negative value to push pacman away from them
-        near_ghosts = []
-        ghost_location = []
-        # for larger maps, "near" is defined as with a 7x7 grid with the ghosts at the middle, with the locations closer to the ghost having a larger warning
-        if width >= 8 or height >= 8:
-            for ghost in ghostsStates:
-                ghost_location.append(ghost[0])
-                for i in range(-3, 4, 1):
-                    for j in range(-3, 4, 1):
-                        near_ghost = (int(ghost[0][0]+i), int(ghost[0][1]+j))
-                        if near_ghost in V1:
-                            if ghost[1] == 0:
-                                if i == 0 and j == 0:
-                                    V1[near_ghost] = self.ghost_reward
-                                elif abs(i) + abs(j) == 1 and near_ghost not in ghost_location:
-                                    # Use an if statement to check if near_ghost location is already chekced to avoid overwriting larger warning sign with a smaller warning
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 2, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 2
-                                elif abs(i) + abs(j) == 2 and near_ghost not in ghost_location:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 4, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 4
-                                elif abs(i) + abs(j) == 3 and near_ghost not in ghost_location:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 8, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 8
-                                else:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.empty_reward, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.empty_reward
-                                near_ghosts.append(near_ghost)
-                            else:
-                                # If ghost is edible, no warning, instead they are ignored
-                                if i == 0 and j == 0:
-                                    V1[near_ghost] = self.ignore_ghost_reward
-        # for smaller maps, warning range is a 3x3 grid with ghost in the middle
-        else:
-            for ghost in ghostsStates:
-                ghost_location.append(ghost[0])
-                for i in range(-1, 2, 1):
-                    for j in range(-1, 2, 1):
-                        near_ghost = (int(ghost[0][0]+i), int(ghost[0][1]+j))
-                        if ghost[1] == 0:
-                            if i == 0 and j == 0:
-                                V1[near_ghost] = self.ghost_reward
-                            else:
-                                V1[near_ghost] = self.ghost_reward / 2
-                            near_ghosts.append(near_ghost)
-                        # If ghost is edible, no warning is given, instead ignore ghost to focus on food
-                        else:
-                            if i == 0 and j == 0:
-                                V1[near_ghost] = self.ignore_ghost_reward
+        # If ghost is edible, no warning is given, instead ignore ghost to focus on food
+        for ghost in ghostsStates:
+            if ghost[1] != 0:
+                location = (int(ghost[0][0]), int(ghost[0][1]))
+                if V1.get(location, "%") != "%":
+                    V1[location] = self.ignore_ghost_reward
+        # The warning falls off with the maze distance to the nearest dangerous ghost
+        # and is given after the edible ghosts, so that it wins where they are close
+        near_ghosts = self.danger.apply(
+            V1, [(int(ghost[0][0]), int(ghost[0][1])) for ghost in ghostsStates if ghost[1] == 0])
+
+        # Start from the utilities of the last move rather than from the rewards
+        if self.warm and self.previousValues is not None:
+            mdpSolvers.warmStart(V1, self.previousValues,
+                                 walls + foods + ghosts + near_ghosts + capsules, width, height)
+        # V1 is updated in place, and so holds the utilities for the next move to start from
+        self.previousValues = V1
+
+        # Hand over to the selected solver if it is not this one
+        tolerance = self.getTolerance(gamma)
+        if self.solver is not None:
+            return self.solver.solve(
+                V1, walls + foods + ghosts + near_ghosts + capsules, reward, gamma, tolerance, deadline)
 
         # Iterate using Bellman update, does not change value for foods, ghosts, near ghost locations and capsules
+        # The cells to update are the same in every sweep, so work them out once per move
+        updatable = mdpSolvers.updatableCells(
+            V1, walls + foods + ghosts + near_ghosts + capsules, width, height)
+        # Return the number of sweeps made and the largest change in the last one (the residual)
+        sweeps = 0
+        residual = 0.0
         for n in range(self.iteration):
             V = V1.copy()
-            for i in range(width-1):
-                for j in range(height-1):
-                    if (i, j) not in walls and (i, j) not in foods and (i, j) not in ghosts and (i, j) not in near_ghosts and (i, j) not in capsules:
-                        V1[(i, j)] = reward + gamma * \
-                            self.getValueOfMove(i, j, V)
+            residual = 0.0
+            for (i, j) in updatable:
+                # V holds this cell's best move utility once it is backed up
+                previous = V1[(i, j)]
+                V1[(i, j)] = reward + gamma * \
+                    self.getValueOfMove(i, j, V)
+                residual = max(residual, abs(V1[(i, j)] - previous))
 
             n += 1
+            sweeps = n
+            if tolerance is not None and residual < tolerance:
+                break
+            if mdpSolvers.pastDeadline(deadline):
+                break
+
+        return sweeps, residual
+
+    def getTolerance(self, gamma):
+        # The residual at which value iteration stops, or None to run all the sweeps
+        if self.stop == "residual":
+            return mdpSolvers.residualBound(self.epsilon, gamma)
+        return None
 
     def getPolicy(self, state, valueMap):
         current_location = api.whereAmI(state)
@@ -397,11 +477,16 @@ class MDPAgent(Agent):
     def getAction(self, state):
         # Get the actions we can try, and remove "STOP" if that is one of them.
         # print "-" * 20
-        legal = api.legalActions(state)
+        # The time budget covers building the value map as well as iterating
+        deadline = mdpSolvers.getDeadline(self.budget)
+        legal = api.observe(state).legal
         # Make valueMap every turn
         valueMap = self.makeValueMap(state)
-        # Iterate
-        self.valueIteration(state, self.reward, self.gamma, valueMap)
+        # Iterate until done or out of time
+        self.solveStats.append(
+            self.valueIteration(state, self.reward, self.gamma, valueMap, deadline))
+        if mdpSolvers.pastDeadline(deadline):
+            self.budgetHits += 1
         # Find the best move
         best_move = self.getPolicy(state, valueMap)
         # print "best move:", best_move
@@ -429,9 +514,29 @@ class MDPAgent(Agent):
 class MDPAgent1(Agent):
 
     # Constructor: this gets run when we first invoke pacman.py
-    def __init__(self):
+    #
+    # solver, stop, epsilon, warm, backups, budget, verbose and the
+    # PARAMETERS work as for MDPAgent.
+    def __init__(self, solver="dict", stop="fixed", epsilon=0.01, warm=False, backups=None, budget=None,
+                 verbose=False, **params):
         print "Starting up MDPAgent!"
         name = "Pacman"
+        self.solverName = solver
+        self.maxBackups = backups
+        if backups is not None:
+            self.maxBackups = int(backups)
+        if stop not in ["fixed", "residual"]:
+            raise Exception("Unknown stop mode " + str(stop) + ", expected fixed or residual")
+        self.stop = stop
+        self.epsilon = float(epsilon)
+        self.warm = isSet(warm)
+        self.budget = budget
+        if budget is not None:
+            self.budget = float(budget)
+        self.verbose = isSet(verbose)
+        self.solveStats = []
+        self.budgetHits = 0
+        self.previousValues = None
 
         self.last = Directions.STOP
 
@@ -443,7 +548,6 @@ class MDPAgent1(Agent):
         self.food_reward = 10.0
         self.capsule_reward = 100.0
         self.ghost_reward = -1000.0
-        self.near_ignore_ghost_reward = 10.0
         self.ignore_ghost_reward = 10.0
         self.empty_reward = -0.5
         self.current_reward = -5.0
@@ -451,6 +555,7 @@ class MDPAgent1(Agent):
         self.iteration = 500
         self.reward = -0.5
         self.gamma = 0.9
+        setParameters(self, params)
 
     # Gets run after an MDPAgent object is created and once there is
     # game state to access.
@@ -461,11 +566,28 @@ class MDPAgent1(Agent):
 
         self.makeMap(state)
         self.addWallsToMap(state)
+        self.transitions = mdpSolvers.getTransitionTable(
+            api.layoutKey(state), api.walls(state), self.map.getWidth(), self.map.getHeight())
+        self.solver = mdpSolvers.getSolver(
+            self.solverName, self.transitions, self.iteration, self.maxBackups)
+        if self.map.getWidth() >= 8 or self.map.getHeight() >= 8:
+            penalties = [self.ghost_reward / n for n in [1, 2, 3, 4, 5]]
+        else:
+            penalties = [self.ghost_reward / n for n in [1, 2]]
+        self.danger = mdpSolvers.DangerField(api.mazeDistancer(state), penalties)
+        self.solveStats = []
+        self.budgetHits = 0
+        self.previousValues = None
 
     # This is what gets run in between multiple games
     def final(self, state):
         print "Looks like the game just ended!"
+        if self.verbose:
+            print mdpSolvers.summariseStats(self.solveStats)
+            if self.budget is not None:
+                print mdpSolvers.summariseBudget(self.budget, self.budgetHits, len(self.solveStats))
 
+        self.previousValues = None
         self.traveled = []
         self.food_locations = []
         self.wall_locations = []
@@ -504,12 +626,13 @@ class MDPAgent1(Agent):
             return south, north
 
     def makeValueMap(self, state):
-        foods = api.food(state)
-        walls = api.walls(state)
-        capsules = api.capsules(state)
-        ghosts = api.ghostStates(state)
-        current_location = api.whereAmI(state)
-        corners = api.corners(state)
+        observation = api.observe(state)
+        foods = observation.food
+        walls = observation.walls
+        capsules = observation.capsules
+        ghosts = observation.ghostStates
+        current_location = observation.position
+        corners = observation.corners
 
         valueMap = {}
 
@@ -539,7 +662,7 @@ class MDPAgent1(Agent):
         width, height = self.getMapDimension(corners)
         for i in range(width-1):
             for j in range(height-1):
-                if (i, j) not in valueMap.keys():
+                if (i, j) not in valueMap:
                     valueMap[(i, j)] = self.empty_reward
 
         for food in self.food_locations:
@@ -551,162 +674,78 @@ class MDPAgent1(Agent):
                 valueMap[capsule] = self.empty_reward
 
         for ghost in ghosts:
-            for location in valueMap.keys():
-                if ghost[0] == location:
-                    if ghost[1] != 1:
-                        valueMap[ghost] = self.ghost_reward
-                    else:
-                        valueMap[ghost] = self.ignore_ghost_reward
+            if ghost[0] in valueMap:
+                if ghost[1] != 1:
+                    valueMap[ghost] = self.ghost_reward
+                else:
+                    valueMap[ghost] = self.ignore_ghost_reward
 
         valueMap[current_location] = self.current_reward
 
         return valueMap
 
     def getTransition(self, x, y, valueMap):
-        self.util_dict = {"north_util": 0.0, "south_util": 0.0,
-                          "east_util": 0.0, "west_util": 0.0}
-
-        self.valueMap = valueMap
-
-        self.x = x
-        self.y = y
-
-        north = (self.x, self.y + 1)
-        south = (self.x, self.y - 1)
-        east = (self.x + 1, self.y)
-        west = (self.x - 1, self.y)
-        current = (self.x, self.y)
-
-        directions = [north, south, east, west]
-
-        for direction in directions:
-            directionL, directionR = self.getSides(
-                direction, north, south, east, west)
-            util = 0
-            if self.valueMap[direction] != "%":
-                util += (0.8 * self.valueMap[direction])
-            else:
-                util += (0.8 * self.valueMap[current])
-            if self.valueMap[directionL] != "%":
-                util += (0.1 * self.valueMap[directionL])
-            else:
-                util += (0.1 * self.valueMap[current])
-            if self.valueMap[directionR] != "%":
-                util += (0.1 * self.valueMap[directionR])
-            else:
-                util += (0.1 * self.valueMap[current])
+        # The utility of the best move from (x, y), using the transition table for this layout
+        valueMap[(x, y)] = self.transitions.bestMoveUtility(valueMap, (x, y))
 
-            if direction == north:
-                self.util_dict['north_util'] = util
-            elif direction == south:
-                self.util_dict['south_util'] = util
-            elif direction == west:
-                self.util_dict['west_util'] = util
-            elif direction == east:
-                self.util_dict['east_util'] = util
-
-        self.valueMap[current] = max(self.util_dict.values())
+        return valueMap[(x, y)]
 
-        return self.valueMap[current]
+    def valueIteration(self, state, reward, gamma, V1, deadline=None):
+        observation = api.observe(state)
+        walls = observation.walls
+        foods = observation.food
+        capsules = observation.capsules
+        ghosts = observation.ghosts
 
-    def valueIteration(self, state, reward, gamma, V1):
-        walls = api.walls(state)
-        foods = api.food(state)
-        capsules = api.capsules(state)
-        ghosts = api.ghosts(state)
-
-        ghostsStates = api.ghostStatesWithTimes(state)
-        corners = api.corners(state)
+        ghostsStates = observation.ghostStatesWithTimes
+        corners = observation.corners
 
         width, height = self.getMapDimension(corners)
 
-        near_ghosts = []
-        ghost_location = []
-        if width >= 8 or height >= 8:
-            for ghost in ghostsStates:
-                ghost_location.append(ghost[0])
-                for i in range(-3, 4, 1):
-                    for j in range(-3, 4, 1):
-                        near_ghost = (int(ghost[0][0]+i), int(ghost[0][1]+j))
-                        if near_ghost in V1:
-                            if ghost[1] == 0:
-                                if i == 0 and j == 0:
-                                    V1[near_ghost] = self.ghost_reward
-                                elif abs(i) + abs(j) == 1 and near_ghost not in ghost_location:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 2, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 2
-                                elif abs(i) + abs(j) == 2 and near_ghost not in ghost_location:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 3, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 3
-                                elif abs(i) + abs(j) == 3 and near_ghost not in ghost_location:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 4, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 4
-                                elif abs(i) + abs(j) == 4 and near_ghost not in ghost_location:
-                                    if near_ghost in near_ghosts:
-                                        V1[near_ghost] = max(
-                                            self.ghost_reward / 5, V1[near_ghost])
-                                    else:
-                                        V1[near_ghost] = self.ghost_reward / 5
-                                near_ghosts.append(near_ghost)
-                            else:
-                                if i == 0 and j == 0:
-                                    V1[near_ghost] = self.ignore_ghost_reward
-        else:
-            for ghost in ghostsStates:
-                ghost_location.append(ghost[0])
-                for i in range(-1, 2, 1):
-                    for j in range(-1, 2, 1):
-                        near_ghost = (int(ghost[0][0]+i), int(ghost[0][1]+j))
-                        if ghost[1] == 0:
-                            if i == 0 and j == 0:
-                                V1[near_ghost] = self.ghost_reward
-                            elif abs(i) + abs(j) == 1 and near_ghost not in ghost_location:
-                                if near_ghost in near_ghosts:
-                                    V1[near_ghost] = max(
-                                        self.ghost_reward / 2, V1[near_ghost])
-                                else:
-                                    V1[near_ghost] = self.ghost_reward / 2
-                            elif abs(i) + abs(j) == 2 and near_ghost not in ghost_location:
-                                if near_ghost in near_ghosts:
-                                    V1[near_ghost] = max(
-                                        self.ghost_reward / 3, V1[near_ghost])
-                                else:
-                                    V1[near_ghost] = self.ghost_reward / 3
-                            elif abs(i) + abs(j) == 3 and near_ghost not in ghost_location:
-                                if near_ghost in near_ghosts:
-                                    V1[near_ghost] = max(
-                                        self.ghost_reward / 4, V1[near_ghost])
-                                else:
-                                    V1[near_ghost] = self.ghost_reward / 4
-                            elif abs(i) + abs(j) == 4 and near_ghost not in ghost_location:
-                                if near_ghost in near_ghosts:
-                                    V1[near_ghost] = max(
-                                        self.ghost_reward / 5, V1[near_ghost])
-                                else:
-                                    V1[near_ghost] = self.ghost_reward / 5
-                            near_ghosts.append(near_ghost)
-                        else:
-                            if i == 0 and j == 0:
-                                V1[near_ghost] = self.ignore_ghost_reward
-
+        for ghost in ghostsStates:
+            if ghost[1] != 0:
+                location = (int(ghost[0][0]), int(ghost[0][1]))
+                if V1.get(location, "%") != "%":
+                    V1[location] = self.ignore_ghost_reward
+        near_ghosts = self.danger.apply(
+            V1, [(int(ghost[0][0]), int(ghost[0][1])) for ghost in ghostsStates if ghost[1] == 0])
+
+        if self.warm and self.previousValues is not None:
+            mdpSolvers.warmStart(V1, self.previousValues,
+                                 walls + foods + ghosts + near_ghosts + capsules, width, height)
+        self.previousValues = V1
+
+        tolerance = self.getTolerance(gamma)
+        if self.solver is not None:
+            return self.solver.solve(
+                V1, walls + foods + ghosts + near_ghosts + capsules, reward, gamma, tolerance, deadline)
+
+        updatable = mdpSolvers.updatableCells(
+            V1, walls + foods + ghosts + near_ghosts + capsules, width, height)
+        sweeps = 0
+        residual = 0.0
         for n in range(self.iteration):
             V = V1.copy()
-            for i in range(width-1):
-                for j in range(height-1):
-                    if (i, j) not in walls and (i, j) not in foods and (i, j) not in ghosts and (i, j) not in near_ghosts and (i, j) not in capsules:
-                        V1[(i, j)] = reward + gamma * \
-                            self.getTransition(i, j, V)
+            residual = 0.0
+            for (i, j) in updatable:
+                previous = V1[(i, j)]
+                V1[(i, j)] = reward + gamma * \
+                    self.getTransition(i, j, V)
+                residual = max(residual, abs(V1[(i, j)] - previous))
 
             n += 1
+            sweeps = n
+            if tolerance is not None and residual < tolerance:
+                break
+            if mdpSolvers.pastDeadline(deadline):
+                break
+
+        return sweeps, residual
+
+    def getTolerance(self, gamma):
+        if self.stop == "residual":
+            return mdpSolvers.residualBound(self.epsilon, gamma)
+        return None
 
     def getPolicy(self, state, iteratedMap):
         current_location = api.whereAmI(state)
@@ -773,10 +812,14 @@ class MDPAgent1(Agent):
     def getAction(self, state):
         # Get the actions we can try, and remove "STOP" if that is one of them.
         # print "-" * 20
-        legal = api.legalActions(state)
+        deadline = mdpSolvers.getDeadline(self.budget)
+        legal = api.observe(state).legal
         valueMap = self.makeValueMap(state)
 
-        self.valueIteration(state, self.reward, self.gamma, valueMap)
+        self.solveStats.append(
+            self.valueIteration(state, self.reward, self.gamma, valueMap, deadline))
+        if mdpSolvers.pastDeadline(deadline):
+            self.budgetHits += 1
 
         best_move = self.getPolicy(state, valueMap)
         # print "best move:", best_move
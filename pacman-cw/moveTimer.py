@@ -0,0 +1,175 @@
+# moveTimer.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Per-move timings of the agents in a batch of games.
+
+A Game whose moveTimer is set calls its startMove and endMove around
+each agent's observationFunction and getAction, whichever way the game
+is run. For each move the timer keeps
+
+  wallTime     seconds on the clock
+  cpuTime      seconds of CPU time used by the process (time.clock)
+  gcObjects    the net number of objects the garbage collector tracks
+               that the move created, from gc.get_count(): the objects
+               it made less those it freed, so it can be below 0. A
+               move in which a full collection runs only counts what it
+               made after the collection. These are not all the move's
+               allocations, since numbers, strings and other objects
+               that cannot hold references are not tracked; Python 2
+               has no tracemalloc to count those.
+
+Each game's samples are kept until endGame, which sums them up, and are
+then added to a ring buffer of the last bufferSize samples of each agent
+over the whole batch. getReport returns the p50, p95, p99, max and mean
+of each measure, for each agent, per game and for the batch, as a dict
+that json can write. To time the games played by pacman.py use
+--timeMoves FILE.
+"""
+
+from collections import deque
+import gc
+import time
+
+# How many samples of each agent the batch keeps
+BUFFER_SIZE = 100000
+
+MEASURES = ['wallTime', 'cpuTime', 'gcObjects']
+
+def trackedObjectCount(counts):
+    """
+    The number of gc-tracked objects made, less those freed, since the
+    last full collection, from the counts of gc.get_count().
+    """
+    count0, count1, count2 = counts
+    threshold0, threshold1, threshold2 = gc.get_threshold()
+    return count0 + threshold0 * (count1 + threshold1 * count2)
+
+def percentile(sortedValues, fraction):
+    "The nearest rank percentile of a sorted, non-empty list."
+    rank = int(fraction * len(sortedValues) + 0.5)
+    return sortedValues[min(max(rank, 1), len(sortedValues)) - 1]
+
+def summarize(values):
+    "The p50, p95, p99, max and mean of a list of numbers."
+    if len(values) == 0: return None
+    values = sorted(values)
+    return {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99), 'max': values[-1],
+            'mean': sum(values) / float(len(values))}
+
+def summarizeSamples(samples):
+    "The summary of each measure in a list of (wallTime, cpuTime, gcObjects)."
+    summary = {'moves': len(samples)}
+    for i, measure in enumerate(MEASURES):
+        summary[measure] = summarize([sample[i] for sample in samples])
+    return summary
+
+class MoveTimer:
+    """
+    Times the moves of the agents in one or more games:
+
+      timer = MoveTimer()
+      game.moveTimer = timer
+      game.run()
+      timer.endGame()
+      ...
+      report = timer.getReport()
+    """
+
+    def __init__(self, bufferSize=BUFFER_SIZE):
+        self.bufferSize = bufferSize
+        # agentIndex -> the samples of the game being played
+        self.gameSamples = {}
+        # agentIndex -> a ring buffer of samples over the batch
+        self.buffers = {}
+        # agentIndex -> [number of moves, max of each measure] over the batch
+        self.totals = {}
+        self.gameReports = []
+        self.start = None
+
+    def startMove(self, agentIndex):
+        self.start = (time.time(), time.clock(), gc.get_count())
+
+    def endMove(self, agentIndex):
+        wallTime, cpuTime, counts = time.time(), time.clock(), gc.get_count()
+        startWall, startCPU, startCounts = self.start
+        gcObjects = trackedObjectCount(counts)
+        # Unless a full collection has reset the counts
+        if counts[2] >= startCounts[2]: gcObjects -= trackedObjectCount(startCounts)
+        sample = (wallTime - startWall, cpuTime - startCPU, gcObjects)
+        self.gameSamples.setdefault(agentIndex, []).append(sample)
+
+    def takeGame(self):
+        """
+        The samples of the game being played, by agent, which are then
+        forgotten. A pool worker sends these to the timer in runGames.
+        """
+        samples = self.gameSamples
+        self.gameSamples = {}
+        return samples
+
+    def endGame(self, samples=None):
+        """
+        Sums up the moves timed since the last game ended, or the samples
+        taken from a timer elsewhere, and adds them to the batch. Returns
+        the game's report: the summary of each agent's moves.
+        """
+        if samples == None: samples = self.takeGame()
+        agents = {}
+        for agentIndex, agentSamples in samples.items():
+            agents[agentIndex] = summarizeSamples(agentSamples)
+            if agentIndex not in self.buffers:
+                self.buffers[agentIndex] = deque(maxlen=self.bufferSize)
+                self.totals[agentIndex] = [0] + [None for measure in MEASURES]
+            self.buffers[agentIndex].extend(agentSamples)
+            totals = self.totals[agentIndex]
+            totals[0] += len(agentSamples)
+            for i, measure in enumerate(MEASURES):
+                gameMax = agents[agentIndex][measure]['max']
+                if totals[i + 1] == None or gameMax > totals[i + 1]: totals[i + 1] = gameMax
+        report = {'game': len(self.gameReports) + 1, 'agents': agents}
+        self.gameReports.append(report)
+        return report
+
+    def getBatchSummary(self):
+        """
+        The summary of each agent's moves over the batch. The percentiles
+        and means are of the samples in the ring buffer, while the number
+        of moves and the maxima count every move.
+        """
+        batch = {}
+        for agentIndex, buffer in self.buffers.items():
+            summary = summarizeSamples(list(buffer))
+            summary['samples'] = summary['moves']
+            totals = self.totals[agentIndex]
+            summary['moves'] = totals[0]
+            for i, measure in enumerate(MEASURES):
+                summary[measure]['max'] = totals[i + 1]
+            batch[agentIndex] = summary
+        return batch
+
+    def getReport(self):
+        "Every game's report and the batch summary, keyed by agent index."
+        return {'bufferSize': self.bufferSize, 'games': self.gameReports,
+                'batch': self.getBatchSummary()}
+
+    def printSummary(self):
+        print 'Move times:    agent  %8s %8s %8s %8s  (ms)  %6s %6s gc-tracked objects' % ('p50', 'p95', 'p99', 'max', 'p50', 'max')
+        batch = self.getBatchSummary()
+        for agentIndex in sorted(batch):
+            wallTime, gcObjects = batch[agentIndex]['wallTime'], batch[agentIndex]['gcObjects']
+            print '               %5d  %8.3f %8.3f %8.3f %8.3f        %6d %6d' % (
+                agentIndex, 1000 * wallTime['p50'], 1000 * wallTime['p95'], 1000 * wallTime['p99'],
+                1000 * wallTime['max'], gcObjects['p50'], gcObjects['max'])
@@ -44,6 +44,8 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
+from game import setGridBackend
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
@@ -72,14 +74,37 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # static variables keep track of the states that successors have been
+    # generated for, and from, when asked to with setExploreMode
+    exploreMode = 'off'
     explored = set()
+    numExplored = 0
+    def setExploreMode( mode ):
+        """
+        Chooses what generateSuccessor records: 'off' (the default)
+        records nothing, 'count' counts the successors generated, and
+        'full' also keeps every state involved in explored, which grows
+        until getAndResetExplored is called.
+        """
+        if mode not in EXPLORE_MODES:
+            raise Exception('Unknown explore mode ' + str(mode))
+        GameState.exploreMode = mode
+        GameState.explored = set()
+        GameState.numExplored = 0
+    setExploreMode = staticmethod(setExploreMode)
+
     def getAndResetExplored():
         tmp = GameState.explored.copy()
         GameState.explored = set()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def getAndResetNumExplored():
+        tmp = GameState.numExplored
+        GameState.numExplored = 0
+        return tmp
+    getAndResetNumExplored = staticmethod(getAndResetNumExplored)
+
     def getLegalActions( self, agentIndex=0 ):
         """
         Returns the legal actions for the agent specified.
@@ -113,7 +138,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.ownAgentState( agentIndex ) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -121,8 +146,11 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.exploreMode != 'off':
+            GameState.numExplored += 1
+            if GameState.exploreMode == 'full':
+                GameState.explored.add(self)
+                GameState.explored.add(state)
         return state
 
     def getLegalPacmanActions( self ):
@@ -141,29 +169,29 @@ class GameState:
         state.pos gives the current position
         state.direction gives the travel vector
         """
-        return self.data.agentStates[0].copy()
+        return self.data._agentStates[0].copy()
 
     def getPacmanPosition( self ):
-        return self.data.agentStates[0].getPosition()
+        return self.data._agentStates[0].getPosition()
 
     def getGhostStates( self ):
-        return self.data.agentStates[1:]
+        return [self.data.ownAgentState( i ) for i in range( 1, self.getNumAgents() )]
 
     def getGhostState( self, agentIndex ):
         if agentIndex == 0 or agentIndex >= self.getNumAgents():
             raise Exception("Invalid index passed to getGhostState")
-        return self.data.agentStates[agentIndex]
+        return self.data.ownAgentState( agentIndex )
 
     def getGhostPosition( self, agentIndex ):
         if agentIndex == 0:
             raise Exception("Pacman's index passed to getGhostPosition")
-        return self.data.agentStates[agentIndex].getPosition()
+        return self.data._agentStates[agentIndex].getPosition()
 
     def getGhostPositions(self):
-        return [s.getPosition() for s in self.getGhostStates()]
+        return [s.getPosition() for s in self.data._agentStates[1:]]
 
     def getNumAgents( self ):
-        return len( self.data.agentStates )
+        return len( self.data._agentStates )
 
     def getScore( self ):
         return float(self.data.score)
@@ -172,10 +200,12 @@ class GameState:
         """
         Returns a list of positions (x,y) of the remaining capsules.
         """
-        return self.data.capsules
+        return self.data.ownCapsules()
 
     def getNumFood( self ):
-        return self.data.food.count()
+        if self.data.numFood == None:
+            self.data.numFood = self.data._food.count()
+        return self.data.numFood
 
     def getFood(self):
         """
@@ -187,7 +217,7 @@ class GameState:
         currentFood = state.getFood()
         if currentFood[x][y] == True: ...
         """
-        return self.data.food
+        return self.data.ownFood()
 
     def getWalls(self):
         """
@@ -199,13 +229,20 @@ class GameState:
         walls = state.getWalls()
         if walls[x][y] == True: ...
         """
-        return self.data.layout.walls
+        return self.data.ownWalls()
 
     def hasFood(self, x, y):
-        return self.data.food[x][y]
+        return self.data._food[x][y]
 
     def hasWall(self, x, y):
-        return self.data.layout.walls[x][y]
+        return self.data._layout.walls[x][y]
+
+    def getLayoutKey(self):
+        """
+        The key that things worked out once for a layout can be kept by
+        (see Layout.getKey).
+        """
+        return self.data.getLayoutKey()
 
     def isLose( self ):
         return self.data._lose
@@ -262,6 +299,7 @@ class GameState:
 SCARED_TIME = 40    # Moves ghosts are scared
 COLLISION_TOLERANCE = 0.7 # How close ghosts must be to Pacman to kill
 TIME_PENALTY = 1 # Number of points lost each round
+EXPLORE_MODES = ['off', 'count', 'full'] # See GameState.setExploreMode
 
 class ClassicGameRules:
     """
@@ -272,11 +310,11 @@ class ClassicGameRules:
         self.timeout = timeout
         self.winssofar = 0
 
-    def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False):
+    def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False, turbo=False):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize( layout, len(ghostAgents) )
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, turbo=turbo)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -340,7 +378,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return state.data._layout.actionTable.getPossibleActions( state.data._agentStates[0].configuration )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -351,7 +389,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.ownAgentState( 0 )
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
@@ -368,23 +406,26 @@ class PacmanRules:
     def consume( position, state ):
         x,y = position
         # Eat food
-        if state.data.food[x][y]:
+        if state.data._food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            numFood = state.getNumFood() - 1
+            state.data.ownFood()[x][y] = False
             state.data._foodEaten = position
-            # TODO: cache numFood?
-            numFood = state.getNumFood()
+            state.data.numFood = numFood
+            if state.data.foodView != None:
+                state.data.foodView = state.data.foodView.eatFood( position )
             if numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
-        if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+        if( position in state.data._capsules ):
+            state.data.ownCapsules().remove( position )
             state.data._capsuleEaten = position
+            if state.data.foodView != None:
+                state.data.foodView = state.data.foodView.eatCapsule( position )
             # Reset all ghosts' scared timers
-            for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+            for index in range( 1, len( state.data._agentStates ) ):
+                state.data.ownAgentState( index ).scaredTimer = SCARED_TIME
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -397,14 +438,8 @@ class GhostRules:
         Ghosts cannot stop, and cannot turn around unless they
         reach a dead end, but can turn 90 degrees at intersections.
         """
-        conf = state.getGhostState( ghostIndex ).configuration
-        possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
-        reverse = Actions.reverseDirection( conf.direction )
-        if Directions.STOP in possibleActions:
-            possibleActions.remove( Directions.STOP )
-        if reverse in possibleActions and len( possibleActions ) > 1:
-            possibleActions.remove( reverse )
-        return possibleActions
+        conf = state.data._agentStates[ghostIndex].configuration
+        return state.data._layout.actionTable.getGhostActions( conf )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action, ghostIndex):
@@ -413,7 +448,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.ownAgentState( ghostIndex )
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
@@ -423,20 +458,22 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            # Other states may share the configuration, so replace it
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( configuration.pos ), configuration.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
     def checkDeath( state, agentIndex):
         pacmanPosition = state.getPacmanPosition()
         if agentIndex == 0: # Pacman just moved; Anyone can kill him
-            for index in range( 1, len( state.data.agentStates ) ):
-                ghostState = state.data.agentStates[index]
+            for index in range( 1, len( state.data._agentStates ) ):
+                ghostState = state.data._agentStates[index]
                 ghostPosition = ghostState.configuration.getPosition()
                 if GhostRules.canKill( pacmanPosition, ghostPosition ):
                     GhostRules.collide( state, ghostState, index )
         else:
-            ghostState = state.data.agentStates[agentIndex]
+            ghostState = state.data._agentStates[agentIndex]
             ghostPosition = ghostState.configuration.getPosition()
             if GhostRules.canKill( pacmanPosition, ghostPosition ):
                 GhostRules.collide( state, ghostState, agentIndex )
@@ -445,9 +482,11 @@ class GhostRules:
     def collide( state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
             state.data.scoreChange += 200
+            ghostState = state.data.ownAgentState( agentIndex )
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -509,6 +548,10 @@ def readCommand( argv ):
                       help='Display output as text only', default=False)
     parser.add_option('-q', '--quietTextGraphics', action='store_true', dest='quietGraphics',
                       help='Generate minimal output and no graphics', default=False)
+    parser.add_option('--turbo', action='store_true', dest='turbo',
+                      help='Play as fast as possible: no graphics, per-game output, muting or timeouts', default=False)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help='Play the games without graphics in a pool of WORKERS processes, each game from its own seed', metavar='WORKERS', default=None)
     parser.add_option('-g', '--ghosts', dest='ghost',
                       help=default('the ghost agent TYPE in the ghostAgents module to use'),
                       metavar = 'TYPE', default='RandomGhost')
@@ -520,8 +563,16 @@ def readCommand( argv ):
                       help='Fixes the random seed to always play the same game', default=False)
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
+    parser.add_option('--recordFile', dest='recordFile',
+                      help='The record file that -r adds the games to, instead of a new one', default=None)
+    parser.add_option('--timeMoves', dest='timingsFile',
+                      help='Times every move of each agent and writes the timings to this file as JSON', default=None)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A file of recorded games (see gameRecord.py) or an old pickled game to replay', default=None)
+    parser.add_option('--replayGame', dest='replayGame', type='int',
+                      help='Only replay this game (1 is the first) of a file of recorded games', default=None)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help='Skip straight to this move of each replayed game', default=0)
     parser.add_option('-a','--agentArgs',dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -532,21 +583,36 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--grid', dest='grid', type='choice', choices=['list', 'array', 'bits'],
+                      help=default('How food and wall grids are stored: list, array (needs numpy) or bits'), default='list')
+    parser.add_option('--explore', dest='explore', type='choice', choices=EXPLORE_MODES,
+                      help=default('What to record about generated successors: off, count or full'), default='off')
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
         raise Exception('Command line input not understood: ' + str(otherjunk))
+    if options.turbo and options.catchExceptions:
+        raise Exception('--turbo does not catch exceptions or enforce timeouts, so it cannot be used with -c')
+    if options.workers != None and options.workers < 1:
+        raise Exception('--workers needs at least one worker')
     args = dict()
 
     # Fix the random seed
     if options.fixRandomSeed: random.seed('cs188')
+    args['seed'] = None
+    if options.fixRandomSeed: args['seed'] = 'cs188'
+
+    # Choose how grids are stored, before the layout makes any
+    setGridBackend( options.grid )
+    GameState.setExploreMode( options.explore )
 
     # Choose a layout
     args['layout'] = layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
 
     # Choose a Pacman agent
-    noKeyboard = options.gameToReplay == None and (options.textGraphics or options.quietGraphics)
+    headless = options.quietGraphics or options.turbo or options.workers != None
+    noKeyboard = options.gameToReplay == None and (options.textGraphics or headless)
     pacmanType = loadAgent(options.pacman, noKeyboard)
     agentOpts = parseAgentArgs(options.agentArgs)
     if options.numTraining > 0:
@@ -565,7 +631,7 @@ def readCommand( argv ):
     args['ghosts'] = [ghostType( i+1 ) for i in range( options.numGhosts )]
 
     # Choose a display format
-    if options.quietGraphics:
+    if headless:
         import textDisplay
         args['display'] = textDisplay.NullGraphics()
     elif options.textGraphics:
@@ -577,16 +643,33 @@ def readCommand( argv ):
         args['display'] = graphicsDisplay.PacmanGraphics(options.zoom, frameTime = options.frameTime)
     args['numGames'] = options.numGames
     args['record'] = options.record
+    if options.recordFile != None: args['recordFile'] = options.recordFile
+    if options.timingsFile != None: args['timingsFile'] = options.timingsFile
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['turbo'] = options.turbo
+    args['workers'] = options.workers
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print 'Replaying recorded game %s.' % options.gameToReplay
+        import gameRecord
+        if gameRecord.isRecordFile(options.gameToReplay):
+            records = gameRecord.readRecords(options.gameToReplay)
+            if options.replayGame != None: records = records[options.replayGame - 1:options.replayGame]
+            for record in records:
+                # The moves before replayFrom are played without a display,
+                # from the nearest keyframe
+                replay = gameRecord.Replay(record)
+                state = replay.seek(min(options.replayFrom, replay.getNumMoves()))
+                replayGame(state.data.layout, record.moves[replay.index:], args['display'], state)
+            sys.exit(0)
+        # Files written by earlier versions are pickles
         import cPickle
         f = open(options.gameToReplay)
         try: recorded = cPickle.load(f)
         finally: f.close()
+        recorded['layout'] = layout.Layout( recorded['layout'].layoutText )
         recorded['display'] = args['display']
         replayGame(**recorded)
         sys.exit(0)
@@ -616,11 +699,17 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def replayGame( layout, actions, display ):
+def replayGame( layout, actions, display, startState=None ):
+    """
+    Shows the actions being played on layout, from its first state or
+    from startState (see gameRecord.Replay to find the state after a
+    given move of a recorded game).
+    """
     import pacmanAgents, ghostAgents
     rules = ClassicGameRules()
     agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(layout.getNumGhosts())]
     game = rules.newGame( layout, agents[0], agents[1:], display )
+    if startState != None: game.state = startState
     state = game.state
     display.initialize(state.data)
 
@@ -634,16 +723,89 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
-    import __main__
-    __main__.__dict__['_display'] = display
+# The games a pool worker is set up to play; see playGamesInParallel
+WORKER_SETUP = None
+
+def setUpWorker( layout, pacman, ghosts, catchExceptions, timeout, turbo, timeMoves ):
+    global WORKER_SETUP
+    WORKER_SETUP = (layout, pacman, ghosts, catchExceptions, timeout, turbo, timeMoves)
 
+def playWorkerGame( job ):
+    """
+    Plays one game in a pool worker, from the random seed it was given,
+    and returns what runGames needs to know about it, with the number of
+    successors generated if GameState is counting them and the samples
+    of its moves if they are timed.
+    """
+    index, seed = job
+    layout, pacman, ghosts, catchExceptions, timeout, turbo, timeMoves = WORKER_SETUP
+    import textDisplay, moveTimer
+    random.seed( seed )
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), True, catchExceptions, turbo )
+    if timeMoves: game.moveTimer = moveTimer.MoveTimer()
+    game.run()
+    samples = None
+    if timeMoves: samples = game.moveTimer.takeGame()
+    # The caller has the layout already, and the food view links back to
+    # the start of the game, so neither is sent back
+    state = game.state
+    state.data.layout = None
+    state.data.foodView = None
+    return state, game.moveHistory, game.agentCrashed, game.agentTimeout, GameState.getAndResetNumExplored(), samples
+
+def playGamesInParallel( layout, pacman, ghosts, numGames, catchExceptions, timeout, turbo, workers, seed, timer=None ):
+    """
+    Plays the games in a pool of worker processes and yields them in
+    game order. Game i starts from the random seed '<seed>-i', whichever
+    worker plays it, so the results do not depend on the number of
+    workers. With one worker the games are played in this process. If
+    there is a timer, the workers time the moves and it gets the samples.
+    """
+    import textDisplay
+    if seed == None: seed = random.getrandbits(32)
+    jobs = [(i, '%s-%d' % (seed, i)) for i in range( numGames )]
+    setup = (layout, pacman, ghosts, catchExceptions, timeout, turbo, timer != None)
+    pool = None
+    if workers == 1:
+        setUpWorker( *setup )
+        results = (playWorkerGame( job ) for job in jobs)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool( workers, setUpWorker, setup )
+        results = pool.imap( playWorkerGame, jobs )
+
+    # The rules see each result in turn, so they report the games in order
+    rules = ClassicGameRules(timeout)
+    rules.quiet = turbo
+    agents = [pacman] + ghosts[:layout.getNumGhosts()]
+    for state, moveHistory, agentCrashed, agentTimeout, numExplored, samples in results:
+        GameState.numExplored += numExplored
+        if timer != None: timer.endGame( samples )
+        state.data.layout = layout
+        game = Game( agents, textDisplay.NullGraphics(), rules, catchExceptions=catchExceptions, turbo=turbo )
+        game.state = state
+        game.moveHistory = moveHistory
+        game.agentCrashed = agentCrashed
+        game.agentTimeout = agentTimeout
+        rules.process( state, game )
+        game.gameOver = True
+        yield game
+    if pool != None:
+        pool.close()
+        pool.join()
+
+def playGames( layout, pacman, ghosts, display, numGames, numTraining, catchExceptions, timeout, turbo, recorder=None, timer=None ):
+    """
+    Plays the games one after another in this process and yields them,
+    writing each move to recorder and timing it with timer if there are
+    ones.
+    """
     rules = ClassicGameRules(timeout)
-    games = []
 
     for i in range( numGames ):
         beQuiet = i < numTraining
-        if beQuiet:
+        if beQuiet or turbo:
                 # Suppress output and graphics
             import textDisplay
             gameDisplay = textDisplay.NullGraphics()
@@ -651,17 +813,44 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         else:
             gameDisplay = display
             rules.quiet = False
-        game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
+        game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet or turbo, catchExceptions, turbo)
+        game.recorder = recorder
+        game.moveTimer = timer
         game.run()
-        if not beQuiet: games.append(game)
+        if timer != None: timer.endGame()
+        yield game
 
-        if record:
-            import time, cPickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, turbo=False, workers=None, seed=None, recordFile=None, timingsFile=None ):
+    import __main__
+    __main__.__dict__['_display'] = display
+
+    recorder = None
+    if record:
+        import gameRecord
+        if recordFile == None:
+            recordFile = 'recorded-games-' + '-'.join([str(t) for t in time.localtime()[1:6]]) + '.rec'
+        recorder = gameRecord.RecordWriter( recordFile )
+    timer = None
+    if timingsFile != None:
+        import moveTimer
+        timer = moveTimer.MoveTimer()
+
+    games = []
+    if workers == None:
+        played = playGames( layout, pacman, ghosts, display, numGames, numTraining, catchExceptions, timeout, turbo, recorder, timer )
+    else:
+        if numTraining > 0: raise Exception('Training games cannot be played by parallel workers')
+        played = playGamesInParallel( layout, pacman, ghosts, numGames, catchExceptions, timeout, turbo, workers, seed, timer )
+
+    for i, game in enumerate( played ):
+        if i >= numTraining: games.append(game)
+
+        if recorder != None and workers != None:
+            # Games played by workers are recorded once they are over
+            initState = GameState()
+            initState.initialize( layout, len(ghosts) )
+            recorder.writeGame( initState, game.moveHistory )
+    if recorder != None: recorder.close()
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -671,6 +860,16 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         print 'Scores:       ', ', '.join([str(score) for score in scores])
         print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
         print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+        if GameState.exploreMode != 'off':
+            print 'Successors:   ', GameState.numExplored
+        if timer != None:
+            timer.printSummary()
+
+    if timer != None:
+        import json
+        f = open( timingsFile, 'w' )
+        try: json.dump( timer.getReport(), f, indent=2, sort_keys=True )
+        finally: f.close()
 
     return games
 
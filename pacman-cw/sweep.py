@@ -0,0 +1,326 @@
+# sweep.py
+#
+# Tries an agent with many settings of its parameters, on several
+# layouts and seeds, and writes out how well each setting played.
+#
+# Run from this directory, for example:
+#
+#   python sweep.py -P food_reward=0.05,0.5,5 -P gamma=0.8,0.9 -l mediumClassic -n 10
+#   python sweep.py --search random -s 20 -P gamma=0.6:0.99 -P ghost_reward=-1000:-10 \
+#       -l '*Classic' -n 5 -a solver=policy -w 4 --csv sweep.csv --json sweep.json
+#
+# Each -P names one of the agent's parameters (see mdpAgents.PARAMETERS)
+# and either a list of values or, for a random search, a range lo:hi. A
+# grid search tries every combination of the lists. A random search
+# draws -s settings, each value uniformly from its list or range.
+#
+# Every setting is played on the same seeds, so the settings are
+# compared on the same games. The games are shared out between -w
+# worker processes. The results have one row for each setting and
+# layout, with the -a string that reproduces the setting in pacman.py.
+#
+# Intended to work with the PacMan AI projects from:
+#
+# http://ai.berkeley.edu/
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+from game import Agent
+import csv
+import itertools
+import json
+import layout
+import multiprocessing
+import pacman
+import random
+import sys
+import textDisplay
+import time
+import util
+
+# The columns written for each setting and layout, after its parameters
+RESULT_FIELDS = ["layout", "games", "wins", "win_rate", "mean_score",
+                 "mean_move_ms", "max_move_ms", "moves", "agent_args"]
+
+
+def parseValue(text):
+    # A number if text is one, otherwise the text.
+    for kind in [int, float]:
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parseSpace(specs):
+    # Turn "name=v1,v2,..." and "name=lo:hi" into a list of (name, values)
+    # pairs, where values is a list or a (lo, hi) tuple.
+    space = []
+    for spec in specs:
+        if '=' not in spec:
+            raise Exception("Expected name=values, not " + spec)
+        name, values = spec.split('=', 1)
+        if ':' in values:
+            lo, hi = [parseValue(value) for value in values.split(':')]
+            space.append((name, (lo, hi)))
+        else:
+            space.append((name, [parseValue(value) for value in values.split(',')]))
+    return space
+
+
+def gridSearch(space):
+    # Every combination of the listed values, as a list of dicts.
+    for name, values in space:
+        if isinstance(values, tuple):
+            raise Exception("A grid search needs a list of values for " + name + ", not a range")
+    names = [name for name, values in space]
+    return [dict(zip(names, combination))
+            for combination in itertools.product(*[values for name, values in space])]
+
+
+def randomSearch(space, samples, seed):
+    # samples settings with each value drawn uniformly from its list or
+    # range. A range whose ends are both whole numbers gives whole numbers.
+    generator = random.Random(seed)
+    settings = []
+    for i in range(samples):
+        setting = {}
+        for name, values in space:
+            if isinstance(values, list):
+                setting[name] = generator.choice(values)
+            elif isinstance(values[0], int) and isinstance(values[1], int):
+                setting[name] = generator.randint(values[0], values[1])
+            else:
+                setting[name] = generator.uniform(values[0], values[1])
+        settings.append(setting)
+    return settings
+
+
+def makeAgentArgs(fixedArgs, setting):
+    # The -a string for pacman.py that plays with setting, after fixedArgs.
+    pieces = ["%s=%s" % (name, setting[name]) for name in sorted(setting)]
+    if fixedArgs:
+        pieces = [fixedArgs] + pieces
+    return ",".join(pieces)
+
+
+class TimedAgent(Agent):
+    # Plays Pacman exactly as agent does, and records how long it takes to choose
+    # each move.
+
+    def __init__(self, agent):
+        Agent.__init__(self)
+        self.agent = agent
+        self.moveTimes = []
+
+    def registerInitialState(self, state):
+        if hasattr(self.agent, "registerInitialState"):
+            self.agent.registerInitialState(state)
+
+    def getAction(self, state):
+        start = time.time()
+        action = self.agent.getAction(state)
+        self.moveTimes.append(time.time() - start)
+        return action
+
+    def final(self, state):
+        if hasattr(self.agent, "final"):
+            self.agent.final(state)
+
+
+# What each worker process plays, and the layouts and agent types it has
+# loaded so far
+WORKER_SETUP = None
+WORKER_CACHE = {}
+
+
+def setUpWorker(pacmanName, ghostName, numGhosts):
+    global WORKER_SETUP
+    WORKER_SETUP = (pacmanName, ghostName, numGhosts)
+
+
+def loadOnce(kind, name, load):
+    # The layout or agent type called name, loading it the first time.
+    if (kind, name) not in WORKER_CACHE:
+        WORKER_CACHE[kind, name] = load(name)
+    return WORKER_CACHE[kind, name]
+
+
+def playSweepGame(job):
+    # Play one game for a sweep and return its score, whether it was won
+    # and the time Pacman took over each move.
+    index, layoutName, agentArgs, seed = job
+    pacmanName, ghostName, numGhosts = WORKER_SETUP
+    lay = loadOnce("layout", layoutName, layout.getLayout)
+    pacmanType = loadOnce("agent", pacmanName, lambda name: pacman.loadAgent(name, True))
+    ghostType = loadOnce("agent", ghostName, lambda name: pacman.loadAgent(name, True))
+
+    util.mutePrint()
+    try:
+        random.seed(seed)
+        agent = TimedAgent(pacmanType(**pacman.parseAgentArgs(agentArgs)))
+        ghosts = [ghostType(i + 1) for i in range(numGhosts)]
+        rules = pacman.ClassicGameRules()
+        game = rules.newGame(lay, agent, ghosts, textDisplay.NullGraphics(), quiet=True, turbo=True)
+        game.run()
+    finally:
+        util.unmutePrint()
+    return index, game.state.getScore(), game.state.isWin(), agent.moveTimes
+
+
+def summarise(layoutName, agentArgs, results):
+    # One row of the output, from the results of the games played with
+    # one setting on one layout.
+    scores = [score for score, won, moveTimes in results]
+    moveTimes = [t for score, won, times in results for t in times]
+    wins = len([won for score, won, times in results if won])
+    return {"layout": layoutName,
+            "games": len(results),
+            "wins": wins,
+            "win_rate": float(wins) / len(results),
+            "mean_score": sum(scores) / float(len(scores)),
+            "mean_move_ms": 1000 * sum(moveTimes) / max(1, len(moveTimes)),
+            "max_move_ms": 1000 * max(moveTimes + [0]),
+            "moves": len(moveTimes),
+            "agent_args": agentArgs}
+
+
+def runSweep(settings, layoutNames, numGames, pacmanName="MDPAgent", fixedArgs=None,
+             ghostName="RandomGhost", numGhosts=4, workers=1, seed="cs188"):
+    # Play numGames games with each setting on each layout, and return a
+    # row of results for each setting and layout, in that order. Game j on
+    # a layout has the same seed for every setting.
+    jobs = []
+    for setting in settings:
+        agentArgs = makeAgentArgs(fixedArgs, setting)
+        for layoutName in layoutNames:
+            for j in range(numGames):
+                jobs.append((len(jobs), layoutName, agentArgs, "%s-%s-%d" % (seed, layoutName, j)))
+
+    setup = (pacmanName, ghostName, numGhosts)
+    if workers == 1:
+        setUpWorker(*setup)
+        results = itertools.imap(playSweepGame, jobs)
+    else:
+        pool = multiprocessing.Pool(workers, setUpWorker, setup)
+        results = pool.imap_unordered(playSweepGame, jobs)
+    played = {}
+    start = time.time()
+    for index, score, won, moveTimes in results:
+        played[index] = (score, won, moveTimes)
+        if len(played) % max(1, len(jobs) / 20) == 0:
+            print >>sys.stderr, "%d/%d games, %.0f s" % (len(played), len(jobs), time.time() - start)
+    if workers != 1:
+        pool.close()
+        pool.join()
+
+    rows = []
+    for setting in settings:
+        for layoutName in layoutNames:
+            first = len(rows) * numGames
+            row = dict(setting)
+            row.update(summarise(layoutName, jobs[first][2],
+                                 [played[index] for index in range(first, first + numGames)]))
+            rows.append(row)
+    return rows
+
+
+def writeCSV(rows, names, path):
+    f = open(path, "wb")
+    try:
+        writer = csv.DictWriter(f, names + RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        f.close()
+
+
+def writeJSON(rows, path):
+    f = open(path, "w")
+    try:
+        json.dump(rows, f, indent=2, sort_keys=True)
+    finally:
+        f.close()
+
+
+def printRows(rows, names):
+    print " ".join(["%12s" % name[:12] for name in names]), \
+        "%-16s %6s %9s %11s %9s" % ("layout", "games", "win rate", "mean score", "ms/move")
+    for row in rows:
+        print " ".join(["%12s" % row[name] for name in names]), \
+            "%-16s %6d %9.2f %11.1f %9.1f" % (row["layout"][:16], row["games"], row["win_rate"],
+                                              row["mean_score"], row["mean_move_ms"])
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python sweep.py -P <name>=<values> [-P ...] <options>
+    EXAMPLES:   python sweep.py -P gamma=0.8,0.9 -P empty_reward=-5,-1 -n 10
+                python sweep.py --search random -s 20 -P gamma=0.6:0.99 -w 4 --csv sweep.csv
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-P', '--param', dest='params', action='append', default=[],
+                      help='a parameter and its values, as name=v1,v2,... or name=lo:hi for a random search')
+    parser.add_option('--search', dest='search', type='choice', choices=['grid', 'random'], default='grid',
+                      help=pacman.default('grid tries every combination, random draws --samples settings'))
+    parser.add_option('-s', '--samples', dest='samples', type='int', default=10,
+                      help=pacman.default('the number of settings for a random search'))
+    parser.add_option('-l', '--layout', dest='layouts', default='mediumClassic',
+                      help=pacman.default('comma separated layouts or patterns such as "*Classic"'))
+    parser.add_option('-n', '--numGames', dest='numGames', type='int', default=10,
+                      help=pacman.default('the number of games (seeds) for each setting on each layout'))
+    parser.add_option('-p', '--pacman', dest='pacman', default='MDPAgent',
+                      help=pacman.default('the agent to tune'))
+    parser.add_option('-a', '--agentArgs', dest='agentArgs',
+                      help='Comma separated values given to the agent with every setting, e.g. "solver=policy"')
+    parser.add_option('-g', '--ghosts', dest='ghost', default='RandomGhost',
+                      help=pacman.default('the ghost agent'))
+    parser.add_option('-k', '--numghosts', dest='numGhosts', type='int', default=4,
+                      help=pacman.default('the maximum number of ghosts'))
+    parser.add_option('-w', '--workers', dest='workers', type='int', default=1,
+                      help=pacman.default('the number of processes to play games in'))
+    parser.add_option('--seed', dest='seed', default='cs188',
+                      help=pacman.default('the seed that the seeds of the games are made from'))
+    parser.add_option('--csv', dest='csv', help='write the results to this CSV file')
+    parser.add_option('--json', dest='json', help='write the results to this JSON file')
+    options, args = parser.parse_args(argv)
+    if len(args) != 0:
+        parser.error('Command line input not understood: ' + str(args))
+    if len(options.params) == 0:
+        parser.error('Give at least one parameter to sweep with -P')
+    if options.workers < 1:
+        parser.error('--workers needs at least one worker')
+    return options
+
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    space = parseSpace(options.params)
+    names = [name for name, values in space]
+    if options.search == 'grid':
+        settings = gridSearch(space)
+    else:
+        settings = randomSearch(space, options.samples, options.seed)
+    layoutNames = [name for pattern in options.layouts.split(',') for name in layout.findLayouts(pattern)]
+    print >>sys.stderr, "%d settings x %d layouts x %d games" % (len(settings), len(layoutNames), options.numGames)
+
+    rows = runSweep(settings, layoutNames, options.numGames, options.pacman, options.agentArgs,
+                    options.ghost, options.numGhosts, options.workers, options.seed)
+    printRows(rows, names)
+    if options.csv:
+        writeCSV(rows, names, options.csv)
+    if options.json:
+        writeJSON(rows, options.json)
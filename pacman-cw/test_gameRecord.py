@@ -0,0 +1,73 @@
+# test_gameRecord.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Tests of gameRecord.py. Run them with
+
+  python -m unittest test_gameRecord
+"""
+
+import cPickle
+import os
+import shutil
+import tempfile
+import unittest
+
+import gameRecord
+import layout
+
+# Pacman wins by eating the only food on his first move, so the ghost
+# never gets to move
+ONE_MOVE_LAYOUT = ['%%%%%',
+                   '%P.G%',
+                   '%%%%%']
+
+class ConvertPicklesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.recordPath = os.path.join(self.directory, 'games.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writePickle(self, actions):
+        path = os.path.join(self.directory, 'recorded-game')
+        f = open(path, 'wb')
+        try:
+            cPickle.dump({'layout': layout.Layout(ONE_MOVE_LAYOUT), 'actions': actions}, f)
+        finally:
+            f.close()
+        return path
+
+    def testGhostWithoutMoves(self):
+        path = self.writePickle([(0, 'East')])
+        gameRecord.convertPickles([path], self.recordPath)
+        records = gameRecord.readRecords(self.recordPath)
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record.numAgents, 2)
+        self.assertEqual(record.moves, [(0, 'East')])
+        self.assertTrue(record.finished)
+        self.assertEqual(record.result, gameRecord.WON)
+        state = record.replay()
+        self.assertTrue(state.isWin())
+        self.assertEqual(state.getGhostPositions(), [(3, 1)])
+
+    def testMoveByMissingGhost(self):
+        path = self.writePickle([(0, 'East'), (2, 'West')])
+        self.assertRaises(Exception, gameRecord.convertPickles, [path], self.recordPath)
+
+if __name__ == '__main__':
+    unittest.main()